@@ -3,15 +3,27 @@ from pathlib import Path
 
 from server_management.main import Main, Config
 
+def jvm_from_args(args) -> dict:
+    return {
+        "profile": args.jvm_profile,
+        "large_pages": {"off": False, "on": True, "transparent": "transparent"}[args.large_pages],
+        "pre_touch": False if args.no_pre_touch else None,
+        "extra_args": args.jvm_arg,
+    }
+
+
 def create_parser():
     """
-    Creates the command-line argument parser with two modes:
+    Creates the command-line argument parser with three modes:
     
     1. Config mode: Use the 'config' command to load and apply the server configuration
        from a JSON file.
        Example: python3 app.py config --file server_config.json
 
-    2. Manual mode: Specify a server directory and then choose the subject and action.
+    2. Cache mode: Inspect or prune the download cache shared by every server directory.
+       Example: python3 app.py cache stats
+
+    3. Manual mode: Specify a server directory and then choose the subject and action.
        Example: python3 app.py manual /path/to/server_dir core install --url https://api.papermc.io/v2/projects/paper/versions/1.21.4/builds/222/downloads/paper-1.21.4-222.jar
                 python3 app.py manual /path/to/server_dir server start --ram 4 6
     """
@@ -23,7 +35,7 @@ def create_parser():
         title="Modes",
         dest="mode",
         required=True,
-        help="Choose one of the following modes: config or manual"
+        help="Choose one of the following modes: config, cache or manual"
     )
     
     # ----------- Config mode -----------
@@ -37,7 +49,46 @@ def create_parser():
         required=True,
         help="Path to the JSON configuration file"
     )
+    config_parser.add_argument(
+        "-s", "--sync",
+        action="store_true",
+        help="Only write the config files of a fleet's servers (server.properties, bukkit.yml, plugin configs...) "
+             "and print the diff, without starting anything"
+    )
+    config_parser.add_argument(
+        "-d", "--dry-run",
+        action="store_true",
+        help="With --sync, only print the diff"
+    )
     
+    # ----------- Cache mode -----------
+    cache_parser = mode_subparsers.add_parser(
+        "cache",
+        help="Inspect or prune the download cache shared by all server directories"
+    )
+    cache_actions = cache_parser.add_subparsers(
+        title="Cache Actions",
+        dest="action",
+        required=True,
+        help="Available actions: stats, prune"
+    )
+    # Cache stats
+    cache_stats = cache_actions.add_parser(
+        "stats",
+        help="Show the cache location, number of files and size"
+    )
+    # Cache prune
+    cache_prune = cache_actions.add_parser(
+        "prune",
+        help="Evict the least recently used files until the cache fits the size cap"
+    )
+    cache_prune.add_argument(
+        "-s", "--max-size",
+        type=int,
+        default=None,
+        help="Size cap in MB (default: the cache's own cap, 10 GB); 0 empties the cache"
+    )
+
     # ----------- Work mode -----------
     manual_parser = mode_subparsers.add_parser(
         "manual",
@@ -60,13 +111,13 @@ def create_parser():
     # ------------------ Core commands ------------------
     core_parser = subject_subparsers.add_parser(
         "core",
-        help="Core operations: install core from URL, install Paper build, or remove core"
+        help="Core operations: install core from URL, install Paper build, update or remove core"
     )
     core_actions = core_parser.add_subparsers(
         title="Core Actions",
         dest="action",
         required=True,
-        help="Available actions: install, install-paper, remove"
+        help="Available actions: install, install-paper, update, remove"
     )
     # Core install (using URL)
     core_install = core_actions.add_parser(
@@ -79,6 +130,12 @@ def create_parser():
         required=True,
         help="URL to download and install the core"
     )
+    core_install.add_argument(
+        "-c", "--connections",
+        type=int,
+        default=4,
+        help="Parallel byte-range connections if the host supports them (default: 4)"
+    )
     # Core install-paper (install Paper build)
     core_install_paper = core_actions.add_parser(
         "install-paper",
@@ -88,13 +145,18 @@ def create_parser():
         "-v" ,"--version",
         type=str,
         required=True,
-        help="Minecraft version for the Paper build"
+        help="Minecraft version for the Paper build, or 'latest'"
     )
     core_install_paper.add_argument(
         "-b", "--build",
         type=str,
-        required=True,
-        help="Build number for the Paper build"
+        default="latest-stable",
+        help="Build number for the Paper build, 'latest' or 'latest-stable' (default: latest-stable)"
+    )
+    # Core update
+    core_update = core_actions.add_parser(
+        "update",
+        help="Download the installed cores again only if their URLs changed"
     )
     # Core remove
     core_remove = core_actions.add_parser(
@@ -111,26 +173,137 @@ def create_parser():
     # ------------------ Server commands ------------------
     server_parser = subject_subparsers.add_parser(
         "server",
-        help="Server operations: start, remove, or change the server icon"
+        help="Server operations: start, train a class archive, send commands, stop, remove, or change the server icon"
     )
     server_actions = server_parser.add_subparsers(
         title="Server Actions",
         dest="action",
         required=True,
-        help="Available actions: start, remove, icon"
+        help="Available actions: start, train-cds, cmd, stop, remove, icon"
+    )
+    # Options shared by every action that launches the server
+    launch_options = argparse.ArgumentParser(add_help=False)
+    launch_options.add_argument(
+        "-r","--ram",
+        nargs=2,
+        metavar=("MIN", "MAX"),
+        type=int,
+        default=(4,6),
+        help="Minimum and maximum RAM (in GB) for the server"
+    )
+    launch_options.add_argument(
+        "-j", "--jvm-profile",
+        choices=["auto", "aikar", "zgc", "shenandoah", "none"],
+        default="none",
+        help="JVM flags to start with: auto (ZGC for 16+ GB heaps on Java 21+, aikar otherwise), "
+             "aikar (tuned G1), zgc, shenandoah or none (default: none, only -Xms/-Xmx)"
+    )
+    launch_options.add_argument(
+        "--large-pages",
+        choices=["off", "on", "transparent"],
+        default="off",
+        help="Back the heap with large pages (on needs hugetlbfs pages set up) or transparent huge pages"
+    )
+    launch_options.add_argument(
+        "--no-pre-touch",
+        action="store_true",
+        help="Do not touch the whole heap at startup (-XX:+AlwaysPreTouch is on for every profile but none)"
+    )
+    launch_options.add_argument(
+        "--java-path",
+        type=str,
+        default="java",
+        help="Java executable to run the server with (default: java)"
+    )
+    launch_options.add_argument(
+        "--jvm-arg",
+        action="append",
+        default=[],
+        metavar="ARG",
+        help="Extra JVM argument, e.g. --jvm-arg=-XX:+UseNUMA; can be repeated"
     )
     # Server start
     server_start = server_actions.add_parser(
         "start",
+        parents=[launch_options],
         help="Start the server with specified options"
     )
     server_start.add_argument(
-        "-r","--ram",
-        nargs=2,
-        metavar=("MIN", "MAX"),
+        "-c", "--capture",
+        action="store_true",
+        help="Also write the console into rotated, compressed files in the console/ directory"
+    )
+    server_start.add_argument(
+        "-m", "--metrics-port",
         type=int,
-        default=(4,6),
-        help="Minimum and maximum RAM (in GB) for the server"
+        help="Serve process, TPS and MSPT metrics as Prometheus text on this local port"
+    )
+    server_start.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=15,
+        help="Seconds between two samples of the server process (default: 15)"
+    )
+    server_start.add_argument(
+        "--tps-interval",
+        type=float,
+        default=60,
+        help="Seconds between two `tps` and `mspt` queries, 0 to never send them (default: 60)"
+    )
+    server_start.add_argument(
+        "--skip-plugin-check",
+        action="store_true",
+        help="Start even if plugins miss dependencies or depend on each other"
+    )
+    server_start.add_argument(
+        "--cds",
+        action="store_true",
+        help="Start with an AppCDS class archive of the core, dumping a new one at exit if the core or JDK changed"
+    )
+    # Server train-cds
+    server_train_cds = server_actions.add_parser(
+        "train-cds",
+        parents=[launch_options],
+        help="Start the server once to build its AppCDS class archive, then stop it"
+    )
+    server_train_cds.add_argument(
+        "-t", "--timeout",
+        type=float,
+        default=600,
+        help="Seconds to wait for the server to start up (default: 600)"
+    )
+    # Server cmd
+    server_cmd = server_actions.add_parser(
+        "cmd",
+        help="Send a console command to the running server and print its reply"
+    )
+    server_cmd.add_argument(
+        "command",
+        type=str,
+        help="Console command, e.g. \"save-all\""
+    )
+    server_cmd.add_argument(
+        "-e", "--expect",
+        type=str,
+        help="Regex of the console line that ends the reply (known for save-all, list, tps...; "
+             "other replies end when the console is quiet)"
+    )
+    server_cmd.add_argument(
+        "-t", "--timeout",
+        type=float,
+        default=10,
+        help="Seconds to wait for the reply (default: 10)"
+    )
+    # Server stop
+    server_stop = server_actions.add_parser(
+        "stop",
+        help="Stop the running server gracefully and wait until it exited"
+    )
+    server_stop.add_argument(
+        "-t", "--timeout",
+        type=float,
+        default=60,
+        help="Seconds to wait for the server to exit (default: 60)"
     )
     # Server remove
     server_remove = server_actions.add_parser(
@@ -152,13 +325,13 @@ def create_parser():
     # ------------------ World commands ------------------
     world_parser = subject_subparsers.add_parser(
         "world",
-        help="World operations: pack, unpack, remove or list worlds"
+        help="World operations: pack, unpack, snapshot, backup, restore, trim, compact, remove or list worlds"
     )
     world_actions = world_parser.add_subparsers(
         title="World Actions",
         dest="action",
         required=True,
-        help="Available actions: pack, unpack, remove, list"
+        help="Available actions: pack, unpack, snapshot, backup, restore, trim, compact, remove, list"
     )
     # World pack
     world_pack = world_actions.add_parser(
@@ -171,6 +344,24 @@ def create_parser():
         required=True,
         help="Name for the world archive"
     )
+    world_pack.add_argument(
+        "-c", "--compression",
+        choices=["none", "gz", "xz"],
+        default="none",
+        help="Compress the archive in parallel into .tar.gz or .tar.xz (default: none)"
+    )
+    world_pack.add_argument(
+        "-l", "--level",
+        type=int,
+        default=None,
+        help="Compression level (default: 6 for gz, 3 for xz)"
+    )
+    world_pack.add_argument(
+        "-w", "--workers",
+        type=int,
+        default=None,
+        help="Number of compressing processes (default: number of CPU cores)"
+    )
     # World unpack
     world_unpack = world_actions.add_parser(
         "unpack",
@@ -182,6 +373,80 @@ def create_parser():
         required=True,
         help="Name of the world archive to unpack"
     )
+    world_unpack.add_argument(
+        "-p", "--path",
+        type=str,
+        action="append",
+        default=None,
+        help="Only restore this member, directory (e.g. world_nether) or glob; can be repeated"
+    )
+    world_unpack.add_argument(
+        "-k", "--keep",
+        action="store_true",
+        help="Keep the archive after a full restore (selective restores always keep it)"
+    )
+    world_unpack.add_argument(
+        "-w", "--workers",
+        type=int,
+        default=None,
+        help="Number of extracting threads (default: number of CPU cores)"
+    )
+    # World snapshot
+    world_snapshot = world_actions.add_parser(
+        "snapshot",
+        help="Snapshot the current world, storing only the files changed since the last snapshot"
+    )
+    world_snapshot.add_argument(
+        "-n", "--name",
+        type=str,
+        required=True,
+        help="Name for the snapshot"
+    )
+    # World backup (hot)
+    world_backup = world_actions.add_parser(
+        "backup",
+        help="Back up the world of a running server without stopping it (snapshot by default)"
+    )
+    world_backup.add_argument(
+        "-n", "--name",
+        type=str,
+        required=True,
+        help="Name for the snapshot or archive"
+    )
+    world_backup.add_argument(
+        "-a", "--archive",
+        action="store_true",
+        help="Write an archive (kept next to the live world) instead of a snapshot"
+    )
+    world_backup.add_argument(
+        "-c", "--compression",
+        choices=["none", "gz", "xz"],
+        default="none",
+        help="Archive compression (default: none)"
+    )
+    world_backup.add_argument(
+        "-l", "--level",
+        type=int,
+        default=None,
+        help="Compression level (default: 6 for gz, 3 for xz)"
+    )
+    world_backup.add_argument(
+        "-w", "--workers",
+        type=int,
+        default=None,
+        help="Number of compressing processes (default: number of CPU cores)"
+    )
+    # World restore
+    world_restore = world_actions.add_parser(
+        "restore",
+        help="Restore a world from a snapshot"
+    )
+    world_restore.add_argument(
+        "-n", "--name",
+        type=str,
+        required=True,
+        help="Name of the snapshot to restore"
+    )
     # World remove
     world_remove = world_actions.add_parser(
         "remove",
@@ -193,22 +458,115 @@ def create_parser():
         required=True,
         help="Name of the world to remove"
     )
+    world_remove.add_argument(
+        "-s", "--snapshot",
+        action="store_true",
+        help="Remove the snapshot with this name instead of the archive"
+    )
+    # World trim
+    world_trim = world_actions.add_parser(
+        "trim",
+        help="Drop the chunks of the current world that players (almost) never visited"
+    )
+    world_trim.add_argument(
+        "-t", "--max-seconds",
+        type=float,
+        default=0,
+        help="Drop chunks players spent at most this many seconds in (default: 0, never visited)"
+    )
+    world_trim.add_argument(
+        "-p", "--protect",
+        action="append",
+        metavar="[DIMENSION:]X1,Z1,X2,Z2",
+        help="Never drop chunks in this block area, e.g. world:-500,-500,500,500; can be repeated"
+    )
+    world_trim.add_argument(
+        "-d", "--dry-run",
+        action="store_true",
+        help="Only report how much space trimming would reclaim"
+    )
+    world_trim.add_argument(
+        "--drop-damaged",
+        action="store_true",
+        help="Trim region files with truncated chunks too, losing those chunks "
+             "(by default such files are left as they are and listed)"
+    )
+    world_trim.add_argument(
+        "-w", "--workers",
+        type=int,
+        help="Number of processes trimming region files (default: one per CPU)"
+    )
+    # World compact
+    world_compact = world_actions.add_parser(
+        "compact",
+        help="Rewrite the region files of the current world without free sectors"
+    )
+    world_compact.add_argument(
+        "-r", "--recompress",
+        type=int,
+        choices=range(1, 10),
+        metavar="LEVEL",
+        help="Also recompress every chunk with zlib at this level (1-9)"
+    )
+    world_compact.add_argument(
+        "-d", "--dry-run",
+        action="store_true",
+        help="Only report how much space compacting would save"
+    )
+    world_compact.add_argument(
+        "--drop-damaged",
+        action="store_true",
+        help="Rewrite region files with truncated chunks too, losing those chunks "
+             "(by default such files are left as they are and listed)"
+    )
+    world_compact.add_argument(
+        "-w", "--workers",
+        type=int,
+        help="Number of processes compacting region files (default: one per CPU)"
+    )
     # World list
     world_list = world_actions.add_parser(
         "list",
-        help="List all available world archives"
+        help="List all available world archives and snapshots"
+    )
+    world_list.add_argument(
+        "-n", "--name",
+        type=str,
+        help="Only list worlds whose name matches this glob, e.g. 'survival-2025*'"
+    )
+    world_list.add_argument(
+        "-v", "--version",
+        type=str,
+        help="Only list archives of this Minecraft version or version prefix, e.g. 1.21"
+    )
+    world_list.add_argument(
+        "-s", "--sort",
+        choices=["name", "created", "size", "members", "version", "last_played"],
+        default="created",
+        help="Sort the list by this field (default: created)"
+    )
+    world_list.add_argument(
+        "-r", "--reverse",
+        action="store_true",
+        help="Sort in descending order"
+    )
+    world_list.add_argument(
+        "-j", "--json",
+        action="store_true",
+        help="Print the list as JSON"
     )
     
     # ------------------ Plugin commands ------------------
     plugin_parser = subject_subparsers.add_parser(
         "plugin",
-        help="Plugin operations: download, bulk download, remove, toggle or list plugins"
+        help="Plugin operations: download, bulk download, check dependencies, update, remove, toggle or list plugins, "
+             "and pack or restore plugin sets"
     )
     plugin_actions = plugin_parser.add_subparsers(
         title="Plugin Actions",
         dest="action",
         required=True,
-        help="Available actions: download, bulk, remove, toggle, list"
+        help="Available actions: download, bulk, check, update, remove, toggle, list, pack, restore, sets, remove-set"
     )
     # Plugin download
     plugin_download = plugin_actions.add_parser(
@@ -232,6 +590,33 @@ def create_parser():
         required=True,
         help="Path to a file with plugin URLs (one per line)"
     )
+    plugin_bulk.add_argument(
+        "-w", "--workers",
+        type=int,
+        default=8,
+        help="Number of plugins downloaded at the same time (default: 8)"
+    )
+    plugin_bulk.add_argument(
+        "-s", "--sources",
+        type=Path,
+        help="JSON file mapping plugin names to download URLs; dependencies the plugins miss are downloaded from it"
+    )
+    # Plugin check
+    plugin_check = plugin_actions.add_parser(
+        "check",
+        help="Check that every plugin dependency is installed and print the load order"
+    )
+    # Plugin update
+    plugin_update = plugin_actions.add_parser(
+        "update",
+        help="Download the installed plugins again only if their URLs changed"
+    )
+    plugin_update.add_argument(
+        "-w", "--workers",
+        type=int,
+        default=8,
+        help="Number of plugins checked at the same time (default: 8)"
+    )
     # Plugin remove
     plugin_remove = plugin_actions.add_parser(
         "remove",
@@ -264,17 +649,65 @@ def create_parser():
         "list",
         help="List all installed plugins"
     )
+    plugin_list.add_argument(
+        "-v", "--versions",
+        action="store_true",
+        help="Show the name, version, API version and dependencies from each jar's plugin.yml"
+    )
+    plugin_list.add_argument(
+        "-j", "--json",
+        action="store_true",
+        help="Print every indexed field as JSON"
+    )
+    # Plugin set pack
+    plugin_pack = plugin_actions.add_parser(
+        "pack",
+        help="Save the installed plugins as a named plugin set in the shared plugin store"
+    )
+    plugin_pack.add_argument(
+        "-n", "--name",
+        type=str,
+        required=True,
+        help="Name of the plugin set"
+    )
+    # Plugin set restore
+    plugin_restore = plugin_actions.add_parser(
+        "restore",
+        help="Replace the installed plugins with a plugin set (the jars are linked from the store and read-only)"
+    )
+    plugin_restore.add_argument(
+        "-n", "--name",
+        type=str,
+        required=True,
+        help="Name of the plugin set"
+    )
+    # Plugin sets
+    plugin_sets = plugin_actions.add_parser(
+        "sets",
+        help="List the plugin sets in the shared plugin store"
+    )
+    # Plugin set remove
+    plugin_remove_set = plugin_actions.add_parser(
+        "remove-set",
+        help="Remove a plugin set, and the stored jars no server or other set uses"
+    )
+    plugin_remove_set.add_argument(
+        "-n", "--name",
+        type=str,
+        required=True,
+        help="Name of the plugin set"
+    )
     
     # ------------------ Properties commands ------------------
     properties_parser = subject_subparsers.add_parser(
         "properties",
-        help="Server properties operations: change port or modify any property"
+        help="Server properties operations: change port, modify any property or apply many from a file"
     )
     properties_actions = properties_parser.add_subparsers(
         title="Properties Actions",
         dest="action",
         required=True,
-        help="Available actions: change-port, change-any"
+        help="Available actions: change-port, change-any, apply"
     )
     # Change server port
     properties_change_port = properties_actions.add_parser(
@@ -304,6 +737,23 @@ def create_parser():
         required=True,
         help="New value for the property"
     )
+    # Apply many properties
+    properties_apply = properties_actions.add_parser(
+        "apply",
+        help="Set every property of a JSON file in one write"
+    )
+    properties_apply.add_argument(
+        "-f", "--from",
+        dest="file",
+        type=Path,
+        required=True,
+        help="JSON file with an object of property names and values, e.g. {\"motd\": \"Hi\", \"pvp\": false}"
+    )
+    properties_apply.add_argument(
+        "-d", "--dry-run",
+        action="store_true",
+        help="Only print what would change"
+    )
     
     return parser
 
@@ -314,51 +764,105 @@ def main():
     if args.mode == "config":
         # Config mode: load configuration from the specified JSON file.
         config = Config(args.file)
-        config()
+        if args.sync:
+            config.sync(args.dry_run)
+        else:
+            config()
+    elif args.mode == "cache":
+        if args.action == "stats":
+            Main.cache_stats()
+        elif args.action == "prune":
+            Main.cache_prune(args.max_size)
     elif args.mode == "manual":
         # Manual mode: use the given work_dir to initialize Main.
         main_obj = Main(args.work_dir)
         if args.subjects == "core":
             if args.action == "install":
-                main_obj.install_other_core(args.url)
+                main_obj.install_other_core(args.url, args.connections)
             elif args.action == "install-paper":
                 main_obj.install_paper_core(args.version, args.build)
+            elif args.action == "update":
+                main_obj.update_cores()
             elif args.action == "remove":
                 main_obj.remove_core(args.name)
         elif args.subjects == "server":
             if args.action == "start":
                 core = main_obj.find_core()
                 ram = tuple(args.ram)
-                main_obj.start_server(core, ram)
+                main_obj.start_server(
+                    core, ram, args.java_path, capture=args.capture, metrics_port=args.metrics_port,
+                    metrics_interval=args.metrics_interval, tps_interval=args.tps_interval,
+                    jvm=jvm_from_args(args), cds=args.cds, check_plugins=not args.skip_plugin_check
+                )
+            elif args.action == "train-cds":
+                main_obj.train_cds(
+                    main_obj.find_core(), tuple(args.ram), args.java_path, jvm_from_args(args), args.timeout
+                )
+            elif args.action == "cmd":
+                main_obj.send_command(args.command, args.expect, args.timeout)
+            elif args.action == "stop":
+                main_obj.stop_server(args.timeout)
             elif args.action == "remove":
                 Main.remove_server(args.work_dir)
             elif args.action == "icon":
                 main_obj.add_icon_sever(args.file)
         elif args.subjects == "world":
             if args.action == "pack":
-                main_obj.pack_world(args.name)
+                compression = None if args.compression == "none" else args.compression
+                main_obj.pack_world(args.name, compression, args.level, args.workers)
             elif args.action == "unpack":
-                main_obj.unpack_world(args.name)
+                main_obj.unpack_world(args.name, args.path, args.keep, args.workers)
+            elif args.action == "snapshot":
+                main_obj.snapshot_world(args.name)
+            elif args.action == "backup":
+                compression = None if args.compression == "none" else args.compression
+                main_obj.backup_world(args.name, args.archive, compression, args.level, args.workers)
+            elif args.action == "restore":
+                main_obj.restore_snapshot(args.name)
             elif args.action == "remove":
-                main_obj.remove_world(args.name)
+                if args.snapshot:
+                    main_obj.remove_snapshot(args.name)
+                else:
+                    main_obj.remove_world(args.name)
+            elif args.action == "trim":
+                main_obj.trim_world(args.max_seconds, args.protect, args.dry_run, args.workers, args.drop_damaged)
+            elif args.action == "compact":
+                main_obj.compact_world(args.recompress, args.dry_run, args.workers, args.drop_damaged)
             elif args.action == "list":
-                main_obj.list_world()
+                main_obj.list_world(args.name, args.version, args.sort, args.reverse, args.json)
         elif args.subjects == "plugin":
             if args.action == "download":
                 main_obj.download_plugin(args.url)
             elif args.action == "bulk":
-                main_obj.bulk_plugin(args.file)
+                main_obj.bulk_plugin(args.file, args.workers, args.sources)
+            elif args.action == "check":
+                main_obj.check_plugins()
+            elif args.action == "update":
+                main_obj.update_plugins(args.workers)
             elif args.action == "remove":
                 main_obj.remove_plugin(args.name)
             elif args.action == "toggle":
                 main_obj.toggle_plugin(args.name, args.disable)
+            elif args.action == "pack":
+                main_obj.pack_plugins(args.name)
+            elif args.action == "restore":
+                main_obj.restore_plugins(args.name)
+            elif args.action == "sets":
+                main_obj.list_plugin_sets()
+            elif args.action == "remove-set":
+                main_obj.remove_plugin_set(args.name)
             elif args.action == "list":
-                main_obj.get_plugin_name(display=True)
+                if args.versions or args.json:
+                    main_obj.list_plugins(args.json)
+                else:
+                    main_obj.get_plugin_name(display=True)
         elif args.subjects == "properties":
             if args.action == "change-port":
                 main_obj.change_port_in_properties(args.port)
             elif args.action == "change-any":
                 main_obj.change_any_param_in_properties(args.param, args.value)
+            elif args.action == "apply":
+                main_obj.apply_properties(args.file, args.dry_run)
     else:
         parser.print_help()
 
@@ -0,0 +1,86 @@
+"""CPU cost per GB of the old chunked download loop vs the shared download engine.
+
+Serves a payload from a local HTTP server in a separate process and downloads it
+with both implementations, measuring the CPU time of the downloading process only.
+
+    python3 benchmarks/download_engine.py --size 1024
+"""
+import argparse
+import hashlib
+import multiprocessing
+import sys
+import tempfile
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from server_management.downloads import download, make_session
+
+PORT = 8799
+
+
+def serve(size: int):
+    block = bytes(range(256)) * 4096 # 1 MB
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Length", str(size))
+            self.end_headers()
+            for _ in range(size // len(block)):
+                self.wfile.write(block)
+
+    ThreadingHTTPServer(("127.0.0.1", PORT), Handler).serve_forever()
+
+
+def old_loop(url: str, path: Path, block_size: int):
+    # what CoreHandler (8 KB) and ModHandler (4 KB) used to do, plus the hash the cache needs
+    digest = hashlib.sha256()
+    with requests.get(url, stream=True) as response:
+        response.raise_for_status()
+        with open(path, "wb") as file:
+            for chunk in response.iter_content(chunk_size=block_size):
+                file.write(chunk)
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+
+def measure(name: str, func, size: int):
+    cpu, wall = time.process_time(), time.perf_counter()
+    func()
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    gb = size / 1024 ** 3
+    print(f"{name:<28} {cpu / gb:6.2f} CPU s/GB  {size / wall / 1024 ** 2:8.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-s", "--size", type=int, default=512, help="Payload size in MB (default: 512)")
+    args = parser.parse_args()
+    size = args.size * 1024 ** 2
+
+    server = multiprocessing.Process(target=serve, args=(size,), daemon=True)
+    server.start()
+    time.sleep(0.5)
+
+    url = f"http://127.0.0.1:{PORT}/payload.jar"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "payload.jar"
+        measure("iter_content 4 KB", lambda: old_loop(url, path, 4096), size)
+        measure("iter_content 8 KB", lambda: old_loop(url, path, 8192), size)
+        measure("download engine", lambda: download(url, path, make_session(1)), size)
+
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
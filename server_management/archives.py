@@ -0,0 +1,336 @@
+import bisect
+import fnmatch
+import gzip
+import json
+import lzma
+import os
+import tarfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+# archive extension -> compression
+ARCHIVE_SUFFIXES = {".tar": None, ".tar.gz": "gz", ".tar.xz": "xz"}
+DEFAULT_LEVELS = {"gz": 6, "xz": 3}
+# every chunk is compressed on its own into a gzip member / xz stream
+CHUNK_SIZE = 8 * 1024 ** 2
+
+
+def archive_name(path: Path) -> str | None:
+    """Returns the world name of an archive path, or None if it is not a world archive."""
+    for suffix in sorted(ARCHIVE_SUFFIXES, key=len, reverse=True):
+        if path.name.endswith(suffix):
+            return path.name[:-len(suffix)]
+    return None
+
+
+def _compress(data: bytes, compression: str, level: int) -> bytes:
+    if compression == "gz":
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    return lzma.compress(data, format=lzma.FORMAT_XZ, preset=level)
+
+
+class ParallelCompressor:
+    """A write-only file object that compresses what is written to it across a process pool.
+
+    The stream is cut into CHUNK_SIZE chunks that are compressed independently
+    (pigz-style) and written in order. Concatenated gzip members and xz streams
+    are valid gzip and xz files, so `tarfile` reads the result like any other.
+    With compression None the data is written through unchanged.
+    """
+
+    def __init__(
+            self, fileobj, compression: str | None, level: int | None = None, workers: int | None = None
+    ):
+        self.fileobj = fileobj
+        self.compression = compression
+        self.level = level if level is not None else DEFAULT_LEVELS.get(compression)
+        self.workers = workers or os.cpu_count() or 1
+
+        self.bytes_in = 0
+        self.bytes_out = 0
+        # [uncompressed offset, compressed offset] where each independently compressed chunk starts
+        self.chunks = []
+
+        self._submitted = 0
+        self._buffer = bytearray()
+        self._pending = deque()
+        self._executor = ProcessPoolExecutor(max_workers=self.workers) if compression else None
+
+    def write(self, data) -> int:
+        self.bytes_in += len(data)
+        if not self.compression:
+            self.fileobj.write(data)
+            self.bytes_out += len(data)
+            return len(data)
+
+        self._buffer += data
+        while len(self._buffer) >= CHUNK_SIZE:
+            self._submit(bytes(self._buffer[:CHUNK_SIZE]))
+            del self._buffer[:CHUNK_SIZE]
+        return len(data)
+
+    def _submit(self, chunk: bytes):
+        self._pending.append(
+            (self._submitted, self._executor.submit(_compress, chunk, self.compression, self.level))
+        )
+        self._submitted += len(chunk)
+        # bounds the memory held by chunks waiting for a worker
+        while len(self._pending) > 2 * self.workers:
+            self._write_next()
+
+    def _write_next(self):
+        start, future = self._pending.popleft()
+        data = future.result()
+        self.chunks.append([start, self.bytes_out])
+        self.fileobj.write(data)
+        self.bytes_out += len(data)
+
+    def close(self):
+        if not self._executor:
+            return
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        while self._pending:
+            self._write_next()
+        self._executor.shutdown()
+        self._executor = None
+
+
+def index_path(archive_path: Path) -> Path:
+    return archive_path.with_name(archive_path.name + ".idx")
+
+
+def read_index(archive_path: Path) -> dict | None:
+    path = index_path(archive_path)
+    if not path.exists():
+        return None
+    with gzip.open(path, "rt") as file:
+        return json.load(file)
+
+
+def _add(
+        archive: tarfile.TarFile, path: Path, arcname: str, members: list
+):
+    """Adds path (recursively) like TarFile.add and records where each member's data starts."""
+    tarinfo = archive.gettarinfo(path, arcname)
+    if tarinfo is None:
+        # sockets and other special files
+        return
+
+    member = {
+        "name": tarinfo.name, "size": tarinfo.size, "mode": tarinfo.mode, "mtime": tarinfo.mtime
+    }
+    if tarinfo.isreg():
+        with open(path, "rb") as file:
+            archive.addfile(tarinfo, file)
+        member["type"] = "file"
+        # the data ends the member, padded to whole blocks
+        member["offset"] = archive.offset - -(-tarinfo.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+    else:
+        archive.addfile(tarinfo)
+        member["type"] = "dir" if tarinfo.isdir() else "symlink" if tarinfo.issym() else "other"
+        member["linkname"] = tarinfo.linkname
+    members.append(member)
+
+    if tarinfo.isdir():
+        for child in sorted(os.listdir(path)):
+            _add(archive, path / child, f"{arcname}/{child}", members)
+
+
+def write_archive(
+        archive_path: Path, directories: list, compression: str | None = None,
+        level: int | None = None, workers: int | None = None
+) -> dict:
+    """Writes directories into a tar archive, compressed in parallel if compression is "gz" or "xz".
+
+    A `.idx` sidecar records the offset of every member and where every compressed
+    chunk starts, so members can later be extracted without reading the whole archive.
+    Returns the sizes before and after compression and the time it took.
+    """
+    started = time.perf_counter()
+    members = []
+    try:
+        with open(archive_path, "wb") as file:
+            compressor = ParallelCompressor(file, compression, level, workers)
+            try:
+                with tarfile.open(fileobj=compressor, mode="w|") as archive:
+                    for directory in directories:
+                        _add(archive, directory, directory.name, members)
+            finally:
+                compressor.close()
+
+        with gzip.open(index_path(archive_path), "wt") as file:
+            json.dump({
+                "compression": compression,
+                "size": compressor.bytes_in,
+                "compressed_size": compressor.bytes_out,
+                "chunks": compressor.chunks,
+                "members": members,
+            }, file)
+    except BaseException:
+        # a half written archive must not look like a world
+        archive_path.unlink(missing_ok=True)
+        index_path(archive_path).unlink(missing_ok=True)
+        raise
+
+    seconds = max(time.perf_counter() - started, 1e-9)
+    return {
+        "bytes_in": compressor.bytes_in,
+        "bytes_out": compressor.bytes_out,
+        "ratio": compressor.bytes_in / max(compressor.bytes_out, 1),
+        "seconds": seconds,
+        "mb_per_s": compressor.bytes_in / seconds / 1024 ** 2,
+        "members": len(members),
+    }
+
+
+class _ChunkReader:
+    """Reads uncompressed byte ranges of an indexed archive, decompressing only the chunks they touch."""
+
+    def __init__(
+            self, archive_path: Path, index: dict
+    ):
+        self.file = open(archive_path, "rb")
+        self.compression = index["compression"]
+        self.chunks = index["chunks"]
+        self.starts = [start for start, _ in self.chunks]
+        self.compressed_size = index["compressed_size"]
+
+        self._chunk = None
+        self._data = b""
+
+    def _load(self, number: int) -> bytes:
+        if number != self._chunk:
+            begin = self.chunks[number][1]
+            end = self.chunks[number + 1][1] if number + 1 < len(self.chunks) else self.compressed_size
+            self.file.seek(begin)
+            data = self.file.read(end - begin)
+            self._data = gzip.decompress(data) if self.compression == "gz" else lzma.decompress(data)
+            self._chunk = number
+        return self._data
+
+    def read(self, offset: int, size: int):
+        """Yields the bytes of [offset, offset + size) piece by piece."""
+        if not self.compression:
+            self.file.seek(offset)
+            while size > 0:
+                data = self.file.read(min(size, CHUNK_SIZE))
+                if not data:
+                    raise EOFError(f"{self.file.name} is truncated")
+                size -= len(data)
+                yield data
+            return
+
+        number = bisect.bisect_right(self.starts, offset) - 1
+        while size > 0:
+            data = self._load(number)
+            begin = offset - self.starts[number]
+            piece = memoryview(data)[begin:begin + size]
+            if not piece:
+                raise EOFError(f"{self.file.name} is truncated")
+            offset += len(piece)
+            size -= len(piece)
+            number += 1
+            yield piece
+
+    def close(self):
+        self.file.close()
+
+
+def read_member(
+        archive_path: Path, index: dict, member: dict
+) -> bytes:
+    """Returns the data of one member of an indexed archive, decompressing only the chunks it is in."""
+    reader = _ChunkReader(archive_path, index)
+    try:
+        return b"".join(reader.read(member["offset"], member["size"]))
+    finally:
+        reader.close()
+
+
+def _selected(name: str, patterns: list | None) -> bool:
+    if not patterns:
+        return True
+    return any(
+        name == pattern or name.startswith(pattern.rstrip("/") + "/") or fnmatch.fnmatch(name, pattern)
+        for pattern in patterns
+    )
+
+
+def _target(dest: Path, name: str) -> Path:
+    target = (dest / name).resolve()
+    if not target.is_relative_to(dest.resolve()):
+        raise ValueError(f"{name} would be extracted outside of {dest}")
+    return target
+
+
+def extract_archive(
+        archive_path: Path, dest: Path, patterns: list | None = None, workers: int | None = None
+) -> int:
+    """Extracts the members matching patterns (all of them by default) into dest.
+
+    A pattern is a member path (a whole directory like `world_nether` works) or a
+    glob like `world/region/r.0.*.mca`. With an index, only the parts of the
+    archive holding those members are read, and the files are written by
+    `workers` threads, each streaming through its own contiguous part of the archive.
+    Archives without an index are streamed once from the start.
+    Returns the number of extracted members.
+    """
+    index = read_index(archive_path)
+    if index is None:
+        extracted = 0
+        # r:* (not the r|* stream mode) reads the multi-member gzip / multi-stream xz of compressed packs
+        with tarfile.open(archive_path, mode="r:*") as archive:
+            for member in archive:
+                if _selected(member.name, patterns):
+                    _target(dest, member.name)
+                    archive.extract(member, path=dest)
+                    extracted += 1
+        return extracted
+
+    members = [member for member in index["members"] if _selected(member["name"], patterns)]
+    files = [member for member in members if member["type"] == "file"]
+
+    for member in members:
+        target = _target(dest, member["name"])
+        if member["type"] == "dir":
+            target.mkdir(parents=True, exist_ok=True)
+        elif member["type"] == "symlink":
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.unlink(missing_ok=True)
+            os.symlink(member["linkname"], target)
+    for member in files:
+        _target(dest, member["name"]).parent.mkdir(parents=True, exist_ok=True)
+
+    # contiguous groups of about the same size, so every thread reads its part once
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files)))
+    group_size = sum(member["size"] for member in files) / workers
+    groups, group, size = [], [], 0
+    for member in sorted(files, key=lambda member: member["offset"]):
+        group.append(member)
+        size += member["size"]
+        if size >= group_size and len(groups) < workers - 1:
+            groups.append(group)
+            group, size = [], 0
+    groups.append(group)
+
+    def extract_group(group: list):
+        reader = _ChunkReader(archive_path, index)
+        try:
+            for member in group:
+                target = _target(dest, member["name"])
+                with open(target, "wb") as file:
+                    for piece in reader.read(member["offset"], member["size"]):
+                        file.write(piece)
+                os.chmod(target, member["mode"])
+                os.utime(target, (member["mtime"], member["mtime"]))
+        finally:
+            reader.close()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(extract_group, groups))
+
+    return len(members)
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+from .fileutil import locked, write_json
+
+DEFAULT_MAX_SIZE = 10 * 1024 ** 3 # 10 GB
+# what the index (and download manifests) remember about a download
+RECORDED_KEYS = ("etag", "last_modified", "content_length", "sha256")
+# version 1 (no "version" key) mapped every url to a plain sha256
+INDEX_VERSION = 2
+
+
+def default_cache_root() -> Path:
+    return Path(
+        os.environ.get("MC_SERVER_CACHE", Path.home() / ".cache" / "minecraft_server")
+    )
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DownloadCache:
+    """A content-addressed cache of downloads (cores, plugins) shared by all server directories.
+
+    Files are stored once under their SHA-256 and indexed by the URL they came from.
+    Every index change happens under an exclusive lock, so several provisioning
+    processes can use the same cache at once.
+    """
+
+    def __init__(
+            self, root: Path | None = None, max_size: int = DEFAULT_MAX_SIZE
+    ):
+        self.root = Path(root) if root else default_cache_root()
+        self.max_size = max_size
+
+        # the directories are made by the first write, not here
+        self.blobs_dir = self.root / "blobs"
+        self.tmp_dir = self.root / "tmp"
+
+        self._index_file = self.root / "index.json"
+        self._lock_file = self.root / ".lock"
+
+    def _read_index(self) -> dict:
+        try:
+            with open(self._index_file, "r") as file:
+                index = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"version": INDEX_VERSION, "urls": {}, "blobs": {}}
+        if index.get("version", 1) == 1:
+            # known files stay cached, without validators they are downloaded again on update
+            index["urls"] = {
+                url: {**dict.fromkeys(RECORDED_KEYS), "sha256": meta} if isinstance(meta, str) else meta
+                for url, meta in index.get("urls", {}).items()
+            }
+            index.setdefault("blobs", {})
+            index["version"] = INDEX_VERSION
+        return index
+
+    def _write_index(self, index: dict):
+        write_json(self._index_file, index)
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.blobs_dir / sha256[:2] / sha256
+
+    def _lookup(self, index: dict, url: str) -> dict | None:
+        meta = index["urls"].get(url)
+        if not meta:
+            return None
+        blob = self.blob_path(meta["sha256"])
+        entry = index["blobs"].get(meta["sha256"])
+        if not entry or not blob.exists() or blob.stat().st_size != entry["size"]:
+            index["urls"].pop(url, None)
+            return None
+        entry["last_used"] = time.time()
+        return meta
+
+    def _link(self, sha256: str, dest: Path):
+        """Hardlinks a blob to dest, falls back to a copy across filesystems."""
+        blob = self.blob_path(sha256)
+        if dest.exists() and dest.samefile(blob):
+            return
+        tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            os.link(blob, tmp)
+        except OSError:
+            shutil.copyfile(blob, tmp)
+        # replacing (instead of writing into dest) never touches a hardlinked blob
+        os.replace(tmp, dest)
+
+    def lookup(self, url: str) -> dict | None:
+        """Returns the sha256 and validators of a cached url or None."""
+        with locked(self._lock_file):
+            index = self._read_index()
+            meta = self._lookup(index, url)
+            self._write_index(index)
+        return meta
+
+    def add(
+            self, url: str, file_path: Path, meta: dict | None = None
+    ) -> dict:
+        """Moves a downloaded file into the cache.
+
+        Returns the url's entry: its sha256 plus the validators given in meta.
+        """
+        meta = dict(meta or {})
+        meta["sha256"] = meta.get("sha256") or sha256_file(file_path)
+        sha256 = meta["sha256"]
+        blob = self.blob_path(sha256)
+
+        with locked(self._lock_file):
+            if blob.exists():
+                file_path.unlink()
+            else:
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                file_path.chmod(0o444)
+                os.replace(file_path, blob)
+
+            index = self._read_index()
+            index["urls"][url] = {key: meta.get(key) for key in RECORDED_KEYS}
+            index["blobs"][sha256] = {"size": blob.stat().st_size, "last_used": time.time()}
+            self._write_index(index)
+
+        return meta
+
+    def _link_cached(
+            self, url: str, dest: Path
+    ) -> dict | None:
+        with locked(self._lock_file):
+            index = self._read_index()
+            meta = self._lookup(index, url)
+            if meta:
+                self._link(meta["sha256"], dest)
+            self._write_index(index)
+        return meta
+
+    def fetch(
+            self, url: str, dest: Path, download, refresh: bool = False
+    ) -> dict:
+        """Puts the file behind url at dest and returns the url's cache entry.
+
+        A cache hit is linked into place without touching the network, a miss
+        (or any call with refresh) calls download(url, path), which returns the
+        validators of the file, and caches the result. The temporary path is
+        the same for every attempt, so a downloader can resume it.
+        """
+        meta = None if refresh else self._link_cached(url, dest)
+        if meta:
+            return meta
+
+        key = hashlib.sha256(url.encode()).hexdigest()
+        tmp = self.tmp_dir / key
+        # only one process downloads a url, the others wait and take the cached file
+        with locked(self.tmp_dir / f"{key}.lock"):
+            meta = None if refresh else self._link_cached(url, dest)
+            if meta:
+                return meta
+            try:
+                meta = self.add(url, tmp, download(url, tmp))
+            finally:
+                if tmp.exists():
+                    tmp.unlink()
+
+            with locked(self._lock_file):
+                self._link(meta["sha256"], dest)
+
+        self.prune()
+        return meta
+
+    def stats(self) -> dict:
+        with locked(self._lock_file):
+            index = self._read_index()
+        return {
+            "path": self.root,
+            "files": len(index["blobs"]),
+            "urls": len(index["urls"]),
+            "size": sum(entry["size"] for entry in index["blobs"].values()),
+            "max_size": self.max_size,
+        }
+
+    def prune(
+            self, max_size: int | None = None
+    ) -> tuple:
+        """Evicts the least recently used files until the cache fits max_size.
+
+        Returns the number of evicted files and the amount of freed bytes.
+        """
+        max_size = self.max_size if max_size is None else max_size
+
+        with locked(self._lock_file):
+            index = self._read_index()
+            blobs = index["blobs"]
+            size = sum(entry["size"] for entry in blobs.values())
+            if size <= max_size:
+                return 0, 0
+
+            removed, freed = 0, 0
+            for sha256 in sorted(blobs, key=lambda key: blobs[key]["last_used"]):
+                if size <= max_size:
+                    break
+                entry = blobs.pop(sha256)
+                self.blob_path(sha256).unlink(missing_ok=True)
+                size -= entry["size"]
+                freed += entry["size"]
+                removed += 1
+
+            index["urls"] = {url: meta for url, meta in index["urls"].items() if meta["sha256"] in blobs}
+            self._write_index(index)
+
+        return removed, freed
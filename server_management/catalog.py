@@ -0,0 +1,141 @@
+import os
+import sqlite3
+import tarfile
+from pathlib import Path
+
+from .archives import archive_name, read_index, read_member
+from .file_index import FileIndex
+from .nbt import read_values
+
+CATALOG_NAME = ".worlds.db"
+SORT_KEYS = ("name", "created", "size", "members", "version", "last_played")
+
+LEVEL_FIELDS = {
+    "Data.LevelName": "level_name",
+    "Data.Version.Name": "version",
+    "Data.DataVersion": "data_version",
+    "Data.LastPlayed": "last_played",
+    # 1.16+ keeps the seed in WorldGenSettings, older worlds in RandomSeed
+    "Data.WorldGenSettings.seed": "seed",
+    "Data.RandomSeed": "seed",
+}
+
+
+def _is_level_dat(name: str) -> bool:
+    # only the level.dat at the top of a world directory, e.g. world/level.dat
+    return name.count("/") == 1 and name.endswith("/level.dat")
+
+
+def _level_fields(data: bytes) -> dict:
+    values = read_values(data, list(LEVEL_FIELDS))
+    fields = {}
+    for path, column in LEVEL_FIELDS.items():
+        if values.get(path) is not None:
+            fields.setdefault(column, values[path])
+    return fields
+
+
+def read_archive(archive_path: Path) -> dict:
+    """Reads the member count and the level.dat fields of the main world of an archive.
+
+    With an index only the chunk holding level.dat is decompressed, archives
+    without one are read once from the start.
+    """
+    index = read_index(archive_path)
+    level_dat = None
+
+    if index is not None:
+        members = index["members"]
+        candidates = sorted(
+            (member for member in members if _is_level_dat(member["name"])),
+            key=lambda member: member["name"] != "world/level.dat"
+        )
+        if candidates:
+            level_dat = read_member(archive_path, index, candidates[0])
+        count = len(members)
+    else:
+        count = 0
+        # r:* (not the r|* stream mode) reads the multi-member gzip / multi-stream xz of compressed packs
+        with tarfile.open(archive_path, mode="r:*") as archive:
+            for member in archive:
+                count += 1
+                if member.isfile() and _is_level_dat(member.name) \
+                        and (level_dat is None or member.name == "world/level.dat"):
+                    level_dat = archive.extractfile(member).read()
+
+    entry = {"members": count}
+    if level_dat:
+        try:
+            entry.update(_level_fields(level_dat))
+        except (ValueError, EOFError, OSError) as e:
+            print(f"{archive_path.name}: could not read level.dat: {e}")
+    return entry
+
+
+class WorldCatalog(FileIndex):
+    """A SQLite catalog of the world archives in a server directory, kept in `.worlds.db`.
+
+    Every archive is read once: its row is kept until the archive's size or
+    mtime changes, so listing hundreds of archives only needs a stat per file.
+    """
+
+    TABLE = "archives"
+    SCHEMA = (
+        "name TEXT PRIMARY KEY, file TEXT, size INTEGER, mtime_ns INTEGER, created REAL, "
+        "members INTEGER, level_name TEXT, version TEXT, data_version INTEGER, "
+        "seed INTEGER, last_played INTEGER"
+    )
+    SCHEMA_VERSION = 1
+    COLUMNS = (
+        "name", "file", "size", "mtime_ns", "created", "members",
+        "level_name", "version", "data_version", "seed", "last_played",
+    )
+
+    def __init__(
+            self, server_dir: Path, workers: int = 8
+    ):
+        super().__init__(server_dir, server_dir / CATALOG_NAME, workers)
+        self.server_dir = server_dir
+
+    def _files(self) -> dict:
+        return {
+            path.name: path.stat() for path in self.server_dir.iterdir() if archive_name(path) and path.is_file()
+        }
+
+    def _read(self, path: Path) -> dict | None:
+        try:
+            return read_archive(path)
+        except (tarfile.TarError, EOFError, OSError) as e:
+            print(f"{path.name}: could not be read: {e}")
+            return None
+
+    def _store(
+            self, connection: sqlite3.Connection, entry: dict, stat: os.stat_result
+    ):
+        entry.update({"name": archive_name(Path(entry["file"])), "created": stat.st_mtime})
+        # the same world name may have moved to another extension
+        connection.execute("DELETE FROM archives WHERE name = ? OR file = ?", (entry["name"], entry["file"]))
+        super()._store(connection, entry, stat)
+
+    def list(
+            self, pattern: str | None = None, version: str | None = None,
+            sort: str = "created", reverse: bool = False
+    ) -> list:
+        """Returns the catalogued archives as dicts.
+
+        pattern is a glob over world names, version a prefix of the Minecraft
+        version (e.g. "1.21"), sort one of SORT_KEYS.
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Can not sort by {sort}, use one of: {', '.join(SORT_KEYS)}")
+
+        query, params = "SELECT * FROM archives WHERE 1", []
+        if pattern:
+            query += " AND name GLOB ?"
+            params.append(pattern)
+        if version:
+            query += " AND version LIKE ? ESCAPE '\\'"
+            params.append(version.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        query += f" ORDER BY {sort} {'DESC' if reverse else 'ASC'}, name"
+
+        return self.query(query, params)
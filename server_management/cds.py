@@ -0,0 +1,93 @@
+import hashlib
+import json
+from pathlib import Path
+
+from .cache import sha256_file
+from .fileutil import write_json
+from .jvm import java_build, java_version
+
+# dynamic archives (-XX:ArchiveClassesAtExit) came with Java 13
+MIN_JAVA = 13
+
+
+class ClassArchive:
+    """An AppCDS archive of the classes a server core loads, kept next to the core.
+
+    The archive is named after the SHA-256 of the core and the `java -version` of
+    the JDK, so a new core or JDK update simply misses it and a new one is dumped.
+    `<core>.cds.json` remembers the core hash (per size and mtime, so the core is
+    not hashed on every start) and the startup time without the archive.
+    """
+
+    def __init__(
+            self, server_core: Path, java_path: str
+    ):
+        self.server_core = server_core
+        self.java_path = java_path
+        self.state_path = server_core.with_name(server_core.name + ".cds.json")
+
+    @property
+    def supported(self) -> bool:
+        version = java_version(self.java_path)
+        return bool(version and version >= MIN_JAVA)
+
+    def _state(self) -> dict:
+        if not self.state_path.exists():
+            return {}
+        with open(self.state_path, "r") as file:
+            return json.load(file)
+
+    def _save_state(self, state: dict):
+        write_json(self.state_path, state, indent=2)
+
+    def _core_sha256(self, state: dict) -> str:
+        stat = self.server_core.stat()
+        core = state.get("core", {})
+        if (core.get("size"), core.get("mtime_ns")) != (stat.st_size, stat.st_mtime_ns):
+            core = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256_file(self.server_core)}
+            state["core"] = core
+            self._save_state(state)
+        return core["sha256"]
+
+    @property
+    def path(self) -> Path:
+        jdk = hashlib.sha256(java_build(self.java_path).encode("utf-8")).hexdigest()
+        key = f"{self._core_sha256(self._state())[:16]}-{jdk[:8]}"
+        return self.server_core.with_name(f"{self.server_core.name}.{key}.jsa")
+
+    def valid(self) -> bool:
+        return self.supported and self.path.exists()
+
+    def flags(self) -> list:
+        """Uses the archive if it is up to date, and dumps a new one at exit otherwise."""
+        if not self.supported:
+            return []
+        if self.path.exists():
+            return [f"-XX:SharedArchiveFile={self.path}"]
+        return [f"-XX:ArchiveClassesAtExit={self.path}"]
+
+    def remove_stale(self) -> int:
+        """Removes archives of older cores or JDKs. Returns how many were removed."""
+        current = self.path
+        stale = [
+            archive for archive in self.server_core.parent.glob(f"{self.server_core.name}.*.jsa")
+            if archive != current
+        ]
+        for archive in stale:
+            archive.unlink()
+        return len(stale)
+
+    def record_startup(
+            self, seconds: float, with_archive: bool
+    ) -> float | None:
+        """Records a startup time. Returns the seconds the archive saved, if it was used and a baseline is known."""
+        state = self._state()
+        if not with_archive:
+            state["baseline"] = seconds
+            self._save_state(state)
+            return None
+        state["last"] = seconds
+        self._save_state(state)
+        if state.get("baseline") is None:
+            return None
+        return state["baseline"] - seconds
@@ -0,0 +1,176 @@
+import gzip
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+READ_SIZE = 64 * 1024
+DEFAULT_RING_SIZE = 1000
+DEFAULT_CAPTURE_SIZE = 64 * 1024 ** 2
+DEFAULT_CAPTURE_BACKUPS = 10
+# "Done (12.345s)! For help, type "help""
+DONE_PATTERN = r"Done \((\d+(?:\.\d+)?)s\)!"
+# colors and cursor movement some consoles add around text
+ANSI_PATTERN = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+
+
+class ConsoleCapture:
+    """Writes console lines into gzip files in a directory, starting a new file every max_bytes.
+
+    Only the newest `backups` files are kept. Level 1 compression keeps up with
+    any console while still shrinking it several times.
+    """
+
+    def __init__(
+            self, directory: Path, max_bytes: int = DEFAULT_CAPTURE_SIZE, backups: int = DEFAULT_CAPTURE_BACKUPS
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+        self._file = None
+        self._written = 0
+
+    def _rotate(self):
+        if self._file:
+            self._file.close()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = self.directory / f"console-{stamp}.log.gz"
+        number = 1
+        while path.exists():
+            path = self.directory / f"console-{stamp}-{number}.log.gz"
+            number += 1
+        self._file = gzip.open(path, "wb", compresslevel=1)
+        self._written = 0
+
+        captures = sorted(self.directory.glob("console-*.log.gz"), key=lambda capture: capture.stat().st_mtime)
+        for capture in captures[:-self.backups]:
+            capture.unlink()
+
+    def write(self, data: bytes):
+        if self._file is None or self._written >= self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._written += len(data)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class Console:
+    """Reads a server's console output on its own thread and hands every line to subscribers.
+
+    The pipe is drained in READ_SIZE reads and split into lines as data comes in,
+    so even thousands of lines per second never fill the pipe and stall the server.
+    The last ring_size lines are kept in memory, and with a capture every line is
+    also written to compressed files.
+    """
+
+    def __init__(
+            self, stream, echo: bool = True, ring_size: int = DEFAULT_RING_SIZE,
+            capture: ConsoleCapture | None = None
+    ):
+        self.stream = stream
+        self.echo = echo
+        self.capture = capture
+        self.lines = deque(maxlen=ring_size)
+
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(
+            self, pattern: str | None, callback, once: bool = False
+    ):
+        """Calls callback(match, line) for every line matching pattern (every line if pattern is None).
+
+        Lines are matched and passed without ANSI escape codes. Callbacks run on
+        the reader thread and should return quickly. Returns a handle for unsubscribe.
+        """
+        subscriber = (re.compile(pattern) if pattern else None, callback, once)
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def recent(
+            self, count: int | None = None
+    ) -> list:
+        lines = list(self.lines)
+        return lines[-count:] if count else lines
+
+    def _dispatch(self, line: str):
+        if "\x1b" in line:
+            # subscribers match the text, not the colors
+            line = ANSI_PATTERN.sub("", line)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            regex, callback, once = subscriber
+            match = regex.search(line) if regex else None
+            if regex and not match:
+                continue
+            if once:
+                self.unsubscribe(subscriber)
+            try:
+                callback(match, line)
+            except Exception as e:
+                print(f"Console subscriber failed on {line.rstrip()!r}: {e}", file=sys.stderr)
+
+    def _read(self):
+        fd = self.stream.fileno()
+        pending = b""
+        try:
+            while True:
+                data = os.read(fd, READ_SIZE)
+                if not data:
+                    break
+                if self.capture:
+                    self.capture.write(data)
+
+                # everything up to the last newline is whole lines, the rest waits for more data
+                end = data.rfind(b"\n")
+                if end == -1:
+                    pending += data
+                    continue
+                chunk, pending = pending + data[:end + 1], data[end + 1:]
+                text = chunk.decode("utf-8", "replace")
+                if self.echo:
+                    sys.stdout.write(text)
+                    sys.stdout.flush()
+                for line in text.splitlines(keepends=True):
+                    self.lines.append(line)
+                    self._dispatch(line)
+        except OSError:
+            pass
+
+        if pending:
+            text = pending.decode("utf-8", "replace")
+            if self.echo:
+                sys.stdout.write(text)
+                sys.stdout.flush()
+            self.lines.append(text)
+            self._dispatch(text)
+        if self.capture:
+            self.capture.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._read, daemon=True)
+        self._thread.start()
+
+    def join(
+            self, timeout: float | None = None
+    ):
+        """Waits until the server closed its output and every line was handled."""
+        if self._thread:
+            self._thread.join(timeout)
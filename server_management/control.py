@@ -0,0 +1,237 @@
+import queue
+import re
+import socket
+import threading
+import time
+from pathlib import Path
+
+SOCKET_NAME = ".control.sock"
+DEFAULT_REPLY_TIMEOUT = 10
+# without a known reply, the reply is every line until the console is quiet this long
+QUIET_TIME = 0.25
+# console lines that end the reply of common commands (matched on the first word)
+REPLIES = {
+    "save-all": r"Saved the game",
+    "save-off": r"Automatic saving is now disabled|Saving is already turned off",
+    "save-on": r"Automatic saving is now enabled|Saving is already turned on",
+    "list": r"There are \d+ of a max of \d+ players online",
+    "whitelist": r"[Ww]hitelist|added to the whitelist|removed from the whitelist",
+    "tps": r"TPS from last 1m, 5m, 15m",
+    "say": r"\[Server\]",
+}
+# console chunks queued for a client before it counts as stalled and is dropped
+CLIENT_BACKLOG = 1024
+
+
+class ControlServer:
+    """A Unix socket in the server directory that lets other processes talk to a running server.
+
+    Every line a client sends is written to the server's stdin, and every console
+    line of the server is sent to every connected client. Each client has its own
+    queue and sending thread, so broadcast never blocks; a client that falls
+    CLIENT_BACKLOG chunks behind is dropped.
+    """
+
+    def __init__(
+            self, server_dir: Path, stdin
+    ):
+        self.path = server_dir / SOCKET_NAME
+        # the server's stdin as a text file, or anything with write and flush
+        self.stdin = stdin
+
+        # {client: queue of console data}
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._socket = None
+
+    def start(self):
+        # a socket left behind by a crashed run
+        self.path.unlink(missing_ok=True)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.bind(str(self.path))
+        self._socket.listen()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self._socket.accept()
+            except OSError:
+                return
+            backlog = queue.Queue(CLIENT_BACKLOG)
+            with self._lock:
+                self._clients[client] = backlog
+            threading.Thread(target=self._read_commands, args=(client,), daemon=True).start()
+            threading.Thread(target=self._write_console, args=(client, backlog), daemon=True).start()
+
+    def _read_commands(self, client: socket.socket):
+        try:
+            with client.makefile("r", encoding="utf-8") as commands:
+                for command in commands:
+                    self.send(command)
+        except OSError:
+            # the client went away without reading everything we sent it
+            pass
+        self._drop(client)
+
+    def _write_console(
+            self, client: socket.socket, backlog: queue.Queue
+    ):
+        """Sends the queued console data to a client until it is dropped (None is queued) or goes away."""
+        try:
+            while (data := backlog.get()) is not None:
+                client.sendall(data)
+        except OSError:
+            pass
+        self._drop(client)
+        # shutdown also ends the reading thread, close alone would wait for it
+        try:
+            client.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        client.close()
+
+    def _drop(self, client: socket.socket):
+        """Disconnects a client; its sending thread sends what is queued already and closes it."""
+        with self._lock:
+            backlog = self._clients.pop(client, None)
+        if backlog is None:
+            return
+        try:
+            backlog.put_nowait(None)
+        except queue.Full:
+            # stalled: shutting the socket down ends the blocked sendall
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def send(self, command: str):
+        with self._lock:
+            self.stdin.write(command.rstrip("\n") + "\n")
+            self.stdin.flush()
+
+    def broadcast(self, line: str):
+        data = line.encode("utf-8")
+        with self._lock:
+            clients = list(self._clients.items())
+        for client, backlog in clients:
+            try:
+                backlog.put_nowait(data)
+            except queue.Full:
+                self._drop(client)
+
+    def close(self):
+        if self._socket:
+            self._socket.close()
+            self._socket = None
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            self._drop(client)
+        self.path.unlink(missing_ok=True)
+
+
+class ControlClient:
+    """Connects to the ControlServer of a server started by this tool."""
+
+    def __init__(
+            self, server_dir: Path
+    ):
+        self.path = server_dir / SOCKET_NAME
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._socket.connect(str(self.path))
+        except (FileNotFoundError, ConnectionRefusedError):
+            self._socket.close()
+            raise ConnectionError(f"No running server found in {server_dir}")
+        # not a socket file: those can not be read from again after a timeout
+        self._buffer = b""
+
+    def send(self, command: str):
+        self._socket.sendall((command.rstrip("\n") + "\n").encode("utf-8"))
+
+    def wait_for(
+            self, pattern: str, timeout: float = 60
+    ) -> str:
+        """Reads console lines until one matches pattern and returns it."""
+        regex = re.compile(pattern)
+        deadline = time.monotonic() + timeout
+        while True:
+            line = self._read_line(deadline - time.monotonic())
+            if line is None:
+                raise TimeoutError(f"The server did not answer with {pattern!r} in {timeout}s")
+            if regex.search(line):
+                return line
+
+    def _read_line(self, timeout: float) -> str | None:
+        """Returns the next console line, or None if there was none in timeout seconds."""
+        deadline = time.monotonic() + timeout
+        while b"\n" not in self._buffer:
+            self._socket.settimeout(max(deadline - time.monotonic(), 0.001))
+            try:
+                data = self._socket.recv(64 * 1024)
+            except socket.timeout:
+                return None
+            if not data:
+                raise ConnectionError("The server stopped")
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return line.decode("utf-8", "replace") + "\n"
+
+    def command(
+            self, command: str, expect: str | None = None, timeout: float = DEFAULT_REPLY_TIMEOUT
+    ) -> list:
+        """Sends a command and returns the console lines of its reply.
+
+        The reply ends with the first line matching expect (by default the known
+        reply of the command from REPLIES). Commands without a known reply collect
+        lines until the console is quiet for QUIET_TIME seconds.
+        """
+        expect = expect or REPLIES.get(command.split(" ", 1)[0])
+        regex = re.compile(expect) if expect else None
+        self.send(command)
+
+        lines = []
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if regex:
+                line = self._read_line(remaining)
+                if line is None:
+                    raise TimeoutError(f"The server did not answer with {expect!r} in {timeout}s")
+                lines.append(line)
+                if regex.search(line):
+                    return lines
+            else:
+                # the first line may take the whole timeout, the next ones only QUIET_TIME
+                line = self._read_line(min(remaining, QUIET_TIME) if lines else remaining)
+                if line is None:
+                    return lines
+                lines.append(line)
+
+    def stop(
+            self, timeout: float = 60
+    ) -> list:
+        """Sends `stop` and waits until the server exited. Returns the console lines it printed meanwhile."""
+        self.send("stop")
+        lines = []
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                line = self._read_line(deadline - time.monotonic())
+            except ConnectionError:
+                # the socket is closed once the process is gone
+                return lines
+            if line is None:
+                raise TimeoutError(f"The server did not stop in {timeout}s")
+            lines.append(line)
+
+    def close(self):
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,125 @@
+def _strongly_connected(graph: dict) -> list:
+    """Tarjan's algorithm, iterative so long dependency chains do not hit the recursion limit."""
+    index, lowlink, on_stack, stack, components = {}, {}, set(), [], []
+    counter = 0
+    for root in graph:
+        if root in index:
+            continue
+        work = [(root, iter(graph[root]))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(graph[child])))
+                    break
+                if child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+
+def resolve(plugins: list) -> dict:
+    """Builds the dependency graph of plugins (dicts with the PluginIndex fields) like Paper does on start.
+
+    Returns:
+        "unreadable": {file: error} of jars without a readable descriptor or a name,
+            which the server would not load either,
+        "order": plugin names in the order the server would load them,
+        "missing": {plugin: [depend entries no plugin provides]}, fatal for the plugin,
+        "soft_missing": {plugin: [softdepend entries no plugin provides]},
+        "cycles": [[plugins depending on each other through depend]], fatal too,
+        "duplicates": {name: [files]} of plugins with the same name.
+    """
+    unreadable = {
+        plugin["file"]: plugin.get("error") or "the descriptor has no name"
+        for plugin in plugins if plugin.get("error") or not plugin.get("name")
+    }
+    plugins = [plugin for plugin in plugins if plugin["file"] not in unreadable]
+
+    files, provided = {}, {}
+    for plugin in plugins:
+        files.setdefault(plugin["name"], []).append(plugin["file"])
+    named = {plugin["name"]: plugin for plugin in plugins}
+    for plugin in named.values():
+        for name in [plugin["name"], *plugin["provides"]]:
+            provided.setdefault(name, plugin["name"])
+
+    missing, soft_missing = {}, {}
+    hard = {name: set() for name in named}
+    # plugin: the plugins that have to load before it
+    before = {name: set() for name in named}
+    for name, plugin in named.items():
+        for dependency in plugin["depend"]:
+            if dependency not in provided:
+                missing.setdefault(name, []).append(dependency)
+            elif provided[dependency] != name:
+                hard[name].add(provided[dependency])
+                before[name].add(provided[dependency])
+        for dependency in plugin["softdepend"]:
+            if dependency not in provided:
+                soft_missing.setdefault(name, []).append(dependency)
+            elif provided[dependency] != name:
+                before[name].add(provided[dependency])
+        for later in plugin["loadbefore"]:
+            if later in provided and provided[later] != name:
+                before[provided[later]].add(name)
+
+    cycles = [sorted(component) for component in _strongly_connected(hard) if len(component) > 1]
+
+    # Kahn's algorithm; soft cycles are broken at the plugin whose hard dependencies are loaded
+    order, loaded = [], set()
+    remaining = set(named)
+    while remaining:
+        ready = sorted(name for name in remaining if before[name] <= loaded)
+        if not ready:
+            ready = sorted(name for name in remaining if hard[name] <= loaded) or sorted(remaining)
+            ready = ready[:1]
+        for name in ready:
+            order.append(name)
+            loaded.add(name)
+            remaining.discard(name)
+
+    return {
+        "unreadable": unreadable,
+        "order": order,
+        "missing": missing,
+        "soft_missing": soft_missing,
+        "cycles": sorted(cycles),
+        "duplicates": {name: sorted(paths) for name, paths in files.items() if len(paths) > 1},
+    }
+
+
+def problems(report: dict) -> list:
+    """Returns the problems of a resolve report that keep plugins from loading, as lines of text."""
+    lines = [f"{file} can not be read: {error}" for file, error in sorted(report["unreadable"].items())]
+    lines += [
+        f"{plugin} needs {', '.join(dependencies)}, which is not installed"
+        for plugin, dependencies in sorted(report["missing"].items())
+    ]
+    lines += [f"{' -> '.join(cycle + cycle[:1])} depend on each other" for cycle in report["cycles"]]
+    lines += [
+        f"{name} is installed more than once: {', '.join(paths)}"
+        for name, paths in sorted(report["duplicates"].items())
+    ]
+    return lines
@@ -0,0 +1,369 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .cache import RECORDED_KEYS, sha256_file
+from .fileutil import write_json
+
+# (connect, read) timeout in seconds for every download request
+TIMEOUT = (10, 60)
+# read buffer window of copy_stream, it grows from MIN to MAX on a fast connection
+MIN_BUFFER_SIZE = 64 * 1024
+MAX_BUFFER_SIZE = 4 * 1024 ** 2
+# ranges are not split below this size
+MIN_SEGMENT_SIZE = 4 * 1024 ** 2
+# progress of a ranged download is saved every CHECKPOINT_SIZE bytes per range
+CHECKPOINT_SIZE = 4 * 1024 ** 2
+
+
+def make_session(pool_size: int = 10) -> requests.Session:
+    """Creates a keep-alive session whose per-host connection pool fits `pool_size` workers."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class DownloadInterrupted(Exception):
+    pass
+
+
+def _load_state(state_file: Path, url: str, length: int, validator: str | None) -> list | None:
+    try:
+        with open(state_file, "r") as file:
+            state = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if (state.get("url"), state.get("length"), state.get("validator")) != (url, length, validator):
+        return None
+    return state["segments"]
+
+
+def _save_state(state_file: Path, url: str, length: int, validator: str | None, segments: list):
+    write_json(state_file, {"url": url, "length": length, "validator": validator, "segments": segments})
+
+
+def validators(headers) -> dict:
+    """Picks what a later conditional request needs out of response headers."""
+    length = headers.get("Content-Length")
+    return {
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "content_length": int(length) if length else None,
+    }
+
+
+def _check_sha256(part: Path, url: str, actual: str, expected: str | None):
+    if expected and actual != expected.lower():
+        part.unlink()
+        raise ValueError(f"{url} failed the sha256 check: expected {expected}, got {actual}")
+
+
+def _preallocate(file, length: int):
+    """Reserves the whole file up front so the filesystem can lay it out in one extent."""
+    try:
+        os.posix_fallocate(file.fileno(), 0, length)
+    except (AttributeError, OSError):
+        # not every platform or filesystem supports it, the file just grows while writing
+        file.truncate(length)
+
+
+def copy_stream(
+        response: requests.Response, file, digest=None, on_write=None
+) -> int:
+    """Copies a streamed response body into file and returns the number of bytes copied.
+
+    The body is read with `readinto` into one reusable buffer whose window grows
+    while reads keep filling it, so large bodies are copied in few big writes.
+    digest (a hashlib object) is updated in the same pass, on_write(n) is called
+    after every write.
+    """
+    raw = response.raw
+    raw.decode_content = True
+
+    buffer = memoryview(bytearray(MAX_BUFFER_SIZE))
+    size = MIN_BUFFER_SIZE
+    copied = 0
+    while True:
+        read = raw.readinto(buffer[:size])
+        if not read:
+            break
+        chunk = buffer[:read]
+        file.write(chunk)
+        if digest:
+            digest.update(chunk)
+        copied += read
+        if on_write:
+            on_write(read)
+        if read == size and size < MAX_BUFFER_SIZE:
+            size *= 2
+    return copied
+
+
+def describe_download(meta: dict) -> str:
+    """Human readable size and throughput of a download, cache hits have no throughput."""
+    if "seconds" not in meta:
+        return f"{(meta.get('content_length') or 0) / 1024 ** 2:.1f} MB, cached"
+    return f"{meta['bytes'] / 1024 ** 2:.1f} MB in {meta['seconds']:.1f}s, {meta['mb_per_s']} MB/s"
+
+
+def _report(meta: dict, copied: int, started: float) -> dict:
+    seconds = max(time.perf_counter() - started, 1e-9)
+    meta["bytes"] = copied
+    meta["seconds"] = round(seconds, 3)
+    meta["mb_per_s"] = round(copied / seconds / 1024 ** 2, 1)
+    return meta
+
+
+def download(
+        url: str, dest: Path, session: requests.Session | None = None, sha256: str | None = None
+) -> dict:
+    """Streams url to dest through a `.part` file that is renamed into place when complete.
+
+    If sha256 is given the file is checked against it before the rename.
+    Returns the validators, sha256 and throughput of the download.
+    """
+    part = dest.with_name(dest.name + ".part")
+    session = session or make_session(1)
+    started = time.perf_counter()
+
+    digest = hashlib.sha256()
+    with session.get(url, stream=True, timeout=TIMEOUT) as response:
+        response.raise_for_status()
+        meta = validators(response.headers)
+        with open(part, "wb") as file:
+            if meta["content_length"]:
+                _preallocate(file, meta["content_length"])
+            copied = copy_stream(response, file, digest)
+            file.truncate(copied)
+
+    _check_sha256(part, url, digest.hexdigest(), sha256)
+    os.replace(part, dest)
+    meta["sha256"] = digest.hexdigest()
+    return _report(meta, copied, started)
+
+
+def download_ranged(
+        url: str, dest: Path, session: requests.Session | None = None, connections: int = 4,
+        sha256: str | None = None
+) -> dict:
+    """Downloads url to dest through a `.part` file that is renamed into place when complete.
+
+    If the server accepts byte ranges the file is fetched as `connections` parallel
+    ranges and an interrupted download resumes from the bytes already written
+    (progress is kept in `.part.json`). Otherwise it falls back to `download`.
+    If sha256 is given the file is checked against it before the rename.
+    Returns the validators, sha256 and throughput of the download.
+    """
+    part = dest.with_name(dest.name + ".part")
+    state_file = dest.with_name(dest.name + ".part.json")
+    session = session or make_session(connections)
+    started = time.perf_counter()
+
+    head = session.head(url, allow_redirects=True, timeout=TIMEOUT)
+    length = int(head.headers.get("Content-Length", 0)) if head.ok else 0
+    validator = head.headers.get("ETag") or head.headers.get("Last-Modified")
+    accepts_ranges = head.headers.get("Accept-Ranges", "").lower() == "bytes"
+
+    if not (accepts_ranges and length):
+        return download(url, dest, session, sha256)
+
+    segments = _load_state(state_file, url, length, validator) if part.exists() else None
+    if segments is None:
+        segment_size = max(MIN_SEGMENT_SIZE, -(-length // connections))
+        segments = [
+            [start, min(start + segment_size, length) - 1, 0] for start in range(0, length, segment_size)
+        ]
+        with open(part, "wb") as file:
+            _preallocate(file, length)
+        _save_state(state_file, url, length, validator, segments)
+
+    lock = threading.Lock()
+    stop = threading.Event()
+    resumed = sum(done for _, _, done in segments)
+
+    def fetch_segment(segment: list):
+        start, end, done = segment
+        if start + done > end:
+            return
+        headers = {"Range": f"bytes={start + done}-{end}"}
+        if validator:
+            headers["If-Range"] = validator
+
+        with session.get(url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise ValueError(f"{url} changed while downloading or ignored the byte range")
+
+            with open(part, "r+b") as file:
+                file.seek(start + done)
+                unsaved = 0
+
+                def checkpoint(written: int):
+                    nonlocal unsaved
+                    if stop.is_set():
+                        raise DownloadInterrupted()
+                    unsaved += written
+                    if unsaved >= CHECKPOINT_SIZE:
+                        file.flush()
+                        with lock:
+                            segment[2] += unsaved
+                            _save_state(state_file, url, length, validator, segments)
+                        unsaved = 0
+
+                try:
+                    copy_stream(response, file, on_write=checkpoint)
+                finally:
+                    # records every byte written so far, also when the range fails midway
+                    file.flush()
+                    with lock:
+                        segment[2] += unsaved
+                        _save_state(state_file, url, length, validator, segments)
+
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        futures = [executor.submit(fetch_segment, segment) for segment in segments]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            # keeps the .part file and its progress for the next attempt
+            stop.set()
+            raise
+
+    if sum(end - start + 1 for start, end, _ in segments) != sum(done for _, _, done in segments):
+        raise ValueError(f"{url} download is incomplete")
+
+    # ranges arrive out of order, so the hash is taken once the file is complete
+    digest = sha256_file(part)
+    state_file.unlink()
+    _check_sha256(part, url, digest, sha256)
+    os.replace(part, dest)
+    return _report({**validators(head.headers), "sha256": digest}, length - resumed, started)
+
+
+def is_modified(
+        session: requests.Session, url: str, recorded: dict
+) -> bool:
+    """Asks with a conditional HEAD whether url changed since `recorded` validators.
+
+    Hosts that do not answer HEAD get a conditional GET, closed as soon as its
+    headers are read, so the body of a changed file is never downloaded.
+    """
+    headers = {}
+    if recorded.get("etag"):
+        headers["If-None-Match"] = recorded["etag"]
+    if recorded.get("last_modified"):
+        headers["If-Modified-Since"] = recorded["last_modified"]
+
+    response = session.head(url, headers=headers, allow_redirects=True, timeout=TIMEOUT)
+    if response.status_code in (405, 501):
+        response = session.get(url, headers=headers, stream=True, timeout=TIMEOUT)
+        # closing an unread body drops only this connection, reading it would download the file
+        response.close()
+    if response.status_code == 304:
+        return False
+    response.raise_for_status()
+    current = validators(response.headers)
+
+    # some hosts ignore conditional headers but still send the same validators
+    if current["etag"] and recorded.get("etag"):
+        return current["etag"] != recorded["etag"]
+    if current["last_modified"] and recorded.get("last_modified"):
+        return (current["last_modified"], current["content_length"]) != \
+            (recorded["last_modified"], recorded.get("content_length"))
+    return True
+
+
+class DownloadManifest:
+    """A `.downloads.json` sidecar that remembers the url and validators of every file downloaded into a directory.
+
+    Entries are keyed by file stem, so a plugin keeps its entry while it is toggled to `.disabled`.
+    """
+
+    def __init__(
+            self, directory: Path
+    ):
+        self.path = directory / ".downloads.json"
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r") as file:
+                self.entries = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def _save(self):
+        write_json(self.path, self.entries, indent=4)
+
+    def record(
+            self, file_path: Path, url: str, meta: dict
+    ):
+        with self._lock:
+            self.entries[file_path.stem] = {
+                "file": file_path.name, "url": url, **{key: meta.get(key) for key in RECORDED_KEYS}
+            }
+            self._save()
+
+    def forget(
+            self, file_path: Path
+    ):
+        with self._lock:
+            if self.entries.pop(file_path.stem, None):
+                self._save()
+
+
+def revalidate(
+        manifest: DownloadManifest, directory: Path, fetch, session: requests.Session, workers: int = 8
+) -> tuple:
+    """Downloads again every file of manifest whose url changed.
+
+    fetch(url, dest) downloads one file and returns its validators. Files that
+    answer 304 or come back with the same content are not rewritten.
+    Returns the lists of updated files, unchanged files and (url, error) failures.
+    """
+    def refresh(entry: dict) -> tuple:
+        dest = directory / entry["file"]
+        if not dest.exists():
+            # a toggled plugin lives under .disabled
+            dest = dest.with_suffix(".disabled")
+        if not dest.exists():
+            manifest.forget(directory / entry["file"])
+            return dest, "missing"
+
+        if not is_modified(session, entry["url"], entry):
+            return dest, "unchanged"
+
+        meta = fetch(entry["url"], dest)
+        manifest.record(directory / entry["file"], entry["url"], meta)
+        if meta.get("sha256") and meta["sha256"] == entry.get("sha256"):
+            return dest, "unchanged"
+        return dest, "updated"
+
+    entries = list(manifest.entries.values())
+    total = len(entries)
+    updated, unchanged, failures = [], [], []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, total))) as executor:
+        futures = {executor.submit(refresh, entry): entry for entry in entries}
+        for done, future in enumerate(as_completed(futures), start=1):
+            entry = futures[future]
+            try:
+                dest, status = future.result()
+            except Exception as e:
+                failures.append((entry["url"], e))
+                print(f"[{done}/{total}] FAILED {entry['file']}: {e}")
+                continue
+            print(f"[{done}/{total}] {dest.name}: {status}")
+            if status == "updated":
+                updated.append(dest.resolve())
+            elif status == "unchanged":
+                unchanged.append(dest.resolve())
+
+    return updated, unchanged, failures
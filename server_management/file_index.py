@@ -0,0 +1,90 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+class FileIndex:
+    """A SQLite table with a row per file of a directory, read once and kept until the file's size or mtime changes.
+
+    Listing hundreds of files then only needs a stat per file; new and changed
+    files are read in parallel. Subclasses set TABLE, SCHEMA (the column
+    definitions, with file, size and mtime_ns), SCHEMA_VERSION and COLUMNS, and
+    implement _files and _read. A table with another SCHEMA_VERSION is rebuilt.
+    """
+
+    TABLE = None
+    SCHEMA = None
+    # bumped whenever the columns change, an old table is then rebuilt
+    SCHEMA_VERSION = 1
+    COLUMNS = ()
+
+    def __init__(
+            self, directory: Path, path: Path, workers: int = 8
+    ):
+        self.directory = directory
+        self.path = path
+        self.workers = workers
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path)
+        connection.row_factory = sqlite3.Row
+        if connection.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+            connection.execute(f"DROP TABLE IF EXISTS {self.TABLE}")
+            connection.execute(f"CREATE TABLE {self.TABLE} ({self.SCHEMA})")
+            connection.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            connection.commit()
+        return connection
+
+    def _files(self) -> dict:
+        """Returns {file name: os.stat_result} of the files to index."""
+        raise NotImplementedError
+
+    def _read(self, path: Path) -> dict | None:
+        """Returns the columns of a file, or None to keep it out of the index (it is read again next time)."""
+        raise NotImplementedError
+
+    def _store(
+            self, connection: sqlite3.Connection, entry: dict, stat: os.stat_result
+    ):
+        connection.execute(
+            f"INSERT OR REPLACE INTO {self.TABLE} ({', '.join(self.COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(self.COLUMNS))})",
+            [entry.get(column) for column in self.COLUMNS]
+        )
+
+    def refresh(self, connection: sqlite3.Connection):
+        """Adds new and changed files to the index and drops the removed ones."""
+        known = {
+            row["file"]: (row["size"], row["mtime_ns"])
+            for row in connection.execute(f"SELECT file, size, mtime_ns FROM {self.TABLE}")
+        }
+        files = self._files()
+        changed = [name for name, stat in files.items() if known.get(name) != (stat.st_size, stat.st_mtime_ns)]
+        gone = [name for name in known if name not in files]
+
+        entries = []
+        if changed:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(changed)))) as executor:
+                entries = list(executor.map(lambda name: (name, self._read(self.directory / name)), changed))
+
+        for name, entry in entries:
+            if entry is None:
+                gone.append(name)
+                continue
+            stat = files[name]
+            entry.update({"file": name, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns})
+            self._store(connection, entry, stat)
+        connection.executemany(f"DELETE FROM {self.TABLE} WHERE file = ?", [(name,) for name in gone])
+        connection.commit()
+
+    def query(
+            self, query: str, params: list | tuple = ()
+    ) -> list:
+        """Refreshes the index and returns the rows of query as dicts."""
+        connection = self._connect()
+        try:
+            self.refresh(connection)
+            return [dict(row) for row in connection.execute(query, params)]
+        finally:
+            connection.close()
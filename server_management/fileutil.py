@@ -0,0 +1,48 @@
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+
+@contextmanager
+def atomic_write(
+        path: Path, mode: str = "w", fsync: bool = False, **open_kwargs
+):
+    """Opens a temporary file next to path and renames it over path once the block succeeds.
+
+    Readers see the old file or the new one, never a partial write. The
+    temporary file carries the pid, so processes writing the same file do not
+    share one; writers within a process still need their own lock.
+    """
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, mode, **open_kwargs) as file:
+            yield file
+            if fsync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def write_json(
+        path: Path, data, **dump_kwargs
+):
+    """Writes data as JSON through atomic_write."""
+    with atomic_write(path) as file:
+        json.dump(data, file, **dump_kwargs)
+
+
+@contextmanager
+def locked(lock_file: Path):
+    """Holds an exclusive flock on lock_file (created if needed) for the block."""
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_file, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,165 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from .cache import DownloadCache
+from .handlers import CoreHandler, ServerHandler, ModHandler
+from .jvm import jvm_options
+from .metrics import DEFAULT_INTERVAL, MetricsCollector
+from .paper import PaperResolver
+from .plugin_store import PluginStore
+from .supervisor import DEFAULT_STOP_TIMEOUT, Supervisor, restart_options
+from .templates import diff, merge, plan, write_changes
+
+
+def expand_servers(data: dict) -> list:
+    """Turns a fleet config into full server configs.
+
+    Every server is the "template" with the "groups" it names merged on in order,
+    and the server's own keys merged last.
+    """
+    template = data.get("template", {})
+    groups = data.get("groups", {})
+    servers = []
+    for server in data["servers"]:
+        expanded = template
+        for group in server.get("groups", []):
+            if group not in groups:
+                raise ValueError(f"{server.get('server_dir')}: unknown group {group}")
+            expanded = merge(expanded, groups[group])
+        servers.append(merge(expanded, server))
+
+    names = [server.get("server_dir") for server in servers]
+    if None in names:
+        raise ValueError("Every server needs a server_dir")
+    if len(set(names)) != len(names):
+        raise ValueError("Every server needs its own server_dir")
+    for server in servers:
+        # a typo in a policy or profile should fail before anything is provisioned
+        restart_options(server.get("restart"))
+        jvm_options(server.get("jvm"))
+    return servers
+
+
+class Fleet:
+    """Provisions many servers in parallel and runs them all from one process."""
+
+    def __init__(
+            self, servers: list, workers: int = 4, stop_timeout: float = DEFAULT_STOP_TIMEOUT,
+            metrics_port: int | None = None, metrics_interval: float = DEFAULT_INTERVAL
+    ):
+        self.servers = servers
+        self.workers = workers
+        self.stop_timeout = stop_timeout
+        self.metrics_port = metrics_port
+        self.metrics_interval = metrics_interval
+
+        self._cache = DownloadCache()
+        self._store = PluginStore(self._cache.root / "plugin-store")
+        self._resolver = PaperResolver()
+
+    def _provision_one(
+            self, server: dict
+    ) -> ServerHandler:
+        server_dir = Path(server["server_dir"])
+
+        core_handler = CoreHandler(server_dir, self._cache, resolver=self._resolver)
+        core = core_handler.find_core()
+        if not core:
+            server_core = server.get("server_core", {})
+            if server_core.get("url"):
+                core = core_handler.install_other_core(server_core["url"])
+            elif server_core.get("version"):
+                core = core_handler.install_paper_core(
+                    server_core["version"], server_core.get("build") or "latest-stable"
+                )
+            else:
+                raise ValueError(f"{server_dir}: no core found and no core url or version given")
+
+        mod_handler = ModHandler(server_dir, self._cache, self._store)
+        if server.get("plugin_set"):
+            mod_handler.restore_plugins(server["plugin_set"])
+        if server.get("plugins"):
+            missing = [url for url in server["plugins"] if not mod_handler._plugin_path(url).exists()]
+            if missing:
+                mod_handler.install_plugins(missing, sources=server.get("plugin_sources"), strict=True)
+        if server.get("plugin_check", True):
+            mod_handler.check_dependencies()
+
+        write_changes(plan([server], workers=1))
+
+        server_handler = ServerHandler(
+            server_dir, core, tuple(server["ram"]), server.get("java_path", "java"), server.get("jvm"),
+            server.get("cds", False)
+        )
+        server_handler._eula_handling()
+        return server_handler
+
+    def provision(self) -> tuple:
+        """Provisions every server (core, plugins, config files, EULA) across a worker pool.
+
+        Returns the ready ServerHandlers and a {server_dir: exception} dict of failures.
+        """
+        ready, failures = [], {}
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            futures = {
+                executor.submit(self._provision_one, server): server["server_dir"] for server in self.servers
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    ready.append(future.result())
+                    print(f"{name}: provisioned")
+                except Exception as e:
+                    failures[name] = e
+                    print(f"{name}: FAILED to provision: {e}")
+        return ready, failures
+
+    def sync_configs(
+            self, dry_run: bool = False
+    ) -> list:
+        """Writes the config files (server.properties, bukkit.yml, plugin configs...) of every server.
+
+        The effective files are computed in parallel and only the ones that change
+        are written; every change is printed as a diff. Returns the changes.
+        """
+        changes = plan(self.servers, self.workers)
+        for change in changes:
+            print(diff(change), end="")
+        if not dry_run:
+            write_changes(changes)
+        return changes
+
+    def run(
+            self, servers: list
+    ) -> dict:
+        """Runs every server under this process until all of them exit for good.
+
+        Each server is supervised by one asyncio event loop: its console goes to
+        console.log in its directory, and it is restarted after a crash following the
+        server's "restart" options. CTRL + C sends `stop` to every server, then SIGTERM
+        after "stop_timeout" seconds. With metrics_port, the processes of all servers are
+        served as Prometheus text on that local port. Returns {server_dir: exit code or exception}.
+        """
+        options = {Path(server["server_dir"]).name: server for server in self.servers}
+        supervisor = Supervisor(
+            [(server, options[server.server_dir.name].get("restart")) for server in servers],
+            self.stop_timeout
+        )
+        collector = None
+        if self.metrics_port:
+            collector = MetricsCollector(self.metrics_interval)
+            for server in servers:
+                name = server.server_dir.name
+                collector.add_server(name, lambda name=name: supervisor.states.get(name, {}).get("pid"))
+            collector.serve(self.metrics_port)
+            print(f"Metrics: http://127.0.0.1:{self.metrics_port}/metrics")
+        try:
+            results = asyncio.run(supervisor.run())
+        finally:
+            if collector:
+                collector.close()
+
+        for name, result in results.items():
+            print(f"{name}: {supervisor.states[name]['status']}, last exit {result}")
+        return results
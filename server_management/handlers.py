@@ -1,11 +1,32 @@
 import requests
+import json
+import shlex
 import subprocess
 import sys
 import shutil
-import tarfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+from .archives import ARCHIVE_SUFFIXES, archive_name, extract_archive, index_path, write_archive
+from .cache import DownloadCache
+from .catalog import WorldCatalog
+from .cds import MIN_JAVA as CDS_MIN_JAVA, ClassArchive
+from .console import DONE_PATTERN, Console, ConsoleCapture
+from .control import DEFAULT_REPLY_TIMEOUT, ControlClient, ControlServer
+from .dependencies import problems, resolve
 from .descriptors import ServerDir, ServerCore, MinMaxRam
+from .downloads import DownloadManifest, describe_download, download, download_ranged, make_session, revalidate
+from .jvm import java_version, jvm_args, jvm_options, resolve_profile
+from .metrics import DEFAULT_INTERVAL, DEFAULT_TPS_INTERVAL, MetricsCollector, watch_console
+from .paper import PaperResolver
+from .plugin_store import PluginStore
+from .plugins import PLUGIN_SUFFIXES, PluginIndex
+from .properties import Properties
+from .regions import CHUNK_DATA_DIRS, areas_for, compact_region, region_dirs, trim_region
+from .snapshots import SnapshotStore
+from .supervisor import DEFAULT_STOP_TIMEOUT
 
 class CoreHandler:
     """A class that handles minecraft server's core."""
@@ -13,9 +34,14 @@ class CoreHandler:
     server_dir = ServerDir("server_dir", Path)
 
     def __init__(
-            self, server_dir: Path 
+            self, server_dir: Path, cache: DownloadCache | None = None, connections: int = 4,
+            resolver: PaperResolver | None = None
     ):
         self.server_dir = server_dir
+        self.cache = cache
+        self.connections = connections
+        self.resolver = resolver
+        self.manifest = DownloadManifest(self.server_dir)
 
     def find_core(self):
         cores = sorted(
@@ -25,27 +51,50 @@ class CoreHandler:
         return cores[0] if cores else None
 
     def install_paper_core(
-            self, version: str, build: str
+            self, version: str, build: str = "latest-stable"
     ) -> Path:
-        url = f"https://api.papermc.io/v2/projects/paper/versions/{version}/builds/{build}/downloads/paper-{version}-{build}.jar"
+        if not self.resolver:
+            self.resolver = PaperResolver()
+        paper_build = self.resolver.resolve(version, build)
 
-        return self.install_other_core(url=url)
+        return self.install_other_core(url=paper_build["url"], sha256=paper_build["sha256"])
+
+    def _fetch(
+            self, url: str, file_name: Path, refresh: bool = False, sha256: str | None = None
+    ) -> dict:
+        download = lambda url, path: download_ranged(url, path, connections=self.connections, sha256=sha256)
+        if not self.cache:
+            return download(url, file_name)
+
+        meta = self.cache.fetch(url, file_name, download, refresh)
+        if sha256 and meta["sha256"] != sha256:
+            meta = self.cache.fetch(url, file_name, download, refresh=True)
+        return meta
 
     def install_other_core(
-            self, url: str
+            self, url: str, sha256: str | None = None
     ) -> Path:
-        with requests.get(url, stream=True) as response:
-            response.raise_for_status()
-            block_size = 8192
-
-            file_name = self.server_dir / url.split("/")[-1]
+        file_name = self.server_dir / url.split("/")[-1]
 
-            with open(file_name, "wb") as file:
-                for chunk in response.iter_content(chunk_size=block_size):
-                    file.write(chunk)
+        meta = self._fetch(url, file_name, sha256=sha256)
+        self.manifest.record(file_name, url, meta)
+        print(f"{file_name.name} ({describe_download(meta)})")
             
         return file_name.resolve()
 
+    def update_cores(self) -> list:
+        if not self.manifest.entries:
+            raise FileNotFoundError(f"No downloaded cores recorded in {self.manifest.path}")
+
+        updated, unchanged, failures = revalidate(
+            self.manifest,
+            self.server_dir,
+            lambda url, file_name: self._fetch(url, file_name, refresh=True),
+            make_session()
+        )
+        print(f"{len(updated)} updated, {len(unchanged)} unchanged, {len(failures)} failed")
+        return updated
+
     def remove_core(
             self, name = None
     ):
@@ -54,10 +103,12 @@ class CoreHandler:
             if not core_file.exists():
                 raise ValueError(f"{core_file} does not exist.")
             core_file.unlink()
+            self.manifest.forget(core_file)
             return
         core_file = [file.resolve() for file in self.server_dir.glob("*.jar")]
         for file in core_file:
             file.unlink()
+            self.manifest.forget(file)
 
 
 class ServerHandler:
@@ -67,12 +118,17 @@ class ServerHandler:
     ram = MinMaxRam("ram", tuple)
 
     def __init__(
-            self, server_dir, server_core, ram, java_path = "java"
+            self, server_dir, server_core, ram, java_path = "java", jvm: dict | None = None, cds: bool = False
     ):
         self.server_dir = server_dir
         self.server_core = server_core
         self.ram = ram
         self.java_path = java_path
+        self.jvm = jvm_options(jvm)
+        self.cds = cds
+        self.class_archive = ClassArchive(self.server_core, self.java_path)
+        self.console = None
+        self.startup_time = None
         
 
     def _print_server(self, stop: bool):
@@ -91,8 +147,10 @@ class ServerHandler:
             Core: {self.server_core.name}
             Min RAM: {self.ram[0]}
             Max RAM: {self.ram[1]}
+            JVM profile: {self._profile()}
 ==================================================
 """ + "\033[0m")
+            print(f"Command: {shlex.join(self._command())}")
 
 
     def _eula_handling(self):
@@ -103,27 +161,152 @@ class ServerHandler:
         
 
 
-    def start_server(self):
+    def _profile(self) -> str:
+        return resolve_profile(self.jvm["profile"], self.ram[1], java_version(self.java_path))
 
+    def _command(self) -> list:
+        return [
+            self.java_path, f"-Xms{self.ram[0]}G", f"-Xmx{self.ram[1]}G",
+            *jvm_args(self.jvm, self.ram, java_version(self.java_path)),
+            *(self.class_archive.flags() if self.cds else []),
+            "-jar", str(self.server_core.name), "--nogui"
+        ]
+
+    def spawn(
+            self, stdin=subprocess.PIPE, stdout=None, stderr=None
+    ) -> subprocess.Popen:
+        """Starts the server process without waiting for it."""
         self._eula_handling()
 
-        command = [
-            self.java_path, f"-Xms{self.ram[0]}G", f"-Xmx{self.ram[1]}G", "-jar", str(self.server_core.name), "--nogui"
-        ]
+        return subprocess.Popen(
+            self._command(), stdin=stdin, stdout=stdout, stderr=stderr, text=True, cwd=self.server_dir
+        )
 
-        server = subprocess.Popen(
-            command, stdin=sys.stdin, stdout=sys.stdout, stderr=sys.stderr, text=True, cwd=self.server_dir
+    @staticmethod
+    def _relay_input(control: ControlServer):
+        for line in sys.stdin:
+            try:
+                control.send(line)
+            except OSError:
+                return
+
+    def _report_startup(self, started: float, with_archive: bool):
+        def report(match, line: str):
+            self.startup_time = time.monotonic() - started
+            print(f"Server started in {self.startup_time:.1f}s (the server reports {match.group(1)}s)")
+            if self.cds and self.class_archive.supported:
+                saved = self.class_archive.record_startup(self.startup_time, with_archive)
+                if saved is not None:
+                    print(f"The class archive saved {saved:.1f}s of startup")
+                elif not with_archive:
+                    print("A class archive for the next start is written when the server stops")
+        return report
+
+    def _prepare_class_archive(self) -> bool:
+        """Returns whether an up to date class archive is used; stale ones are removed."""
+        if not self.cds:
+            return False
+        if not self.class_archive.supported:
+            print(f"Class archives need Java {CDS_MIN_JAVA} or newer, starting without one")
+            return False
+        if self.class_archive.valid():
+            return True
+        self.class_archive.remove_stale()
+        return False
+
+    def train_class_archive(
+            self, timeout: float = 600
+    ) -> float:
+        """Starts the server once, stops it as soon as it is up and keeps the class archive dumped at exit.
+
+        Returns the startup time without an archive.
+        """
+        if not self.class_archive.supported:
+            raise ValueError(f"Class archives need Java {CDS_MIN_JAVA} or newer")
+        self.cds = True
+        self.class_archive.path.unlink(missing_ok=True)
+        self.class_archive.remove_stale()
+
+        started = time.monotonic()
+        server = self.spawn(stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        console = Console(server.stdout, echo=False)
+        done = threading.Event()
+        console.subscribe(DONE_PATTERN, lambda match, line: done.set(), once=True)
+        console.start()
+        try:
+            while not done.wait(1):
+                if server.poll() is not None:
+                    console.join()
+                    raise RuntimeError(
+                        f"The server exited with {server.returncode} before it was up:\n" + "".join(console.recent(20))
+                    )
+                if time.monotonic() - started > timeout:
+                    raise TimeoutError(f"The server was not up after {timeout}s")
+            startup = time.monotonic() - started
+            self.class_archive.record_startup(startup, with_archive=False)
+            server.stdin.write("stop\n")
+            server.stdin.flush()
+            server.wait()
+        finally:
+            if server.poll() is None:
+                server.kill()
+                server.wait()
+        console.join()
+
+        if not self.class_archive.valid():
+            raise RuntimeError("The JVM did not write a class archive:\n" + "".join(console.recent(20)))
+        return startup
+
+    def start_server(
+            self, capture: bool = False, metrics_port: int | None = None,
+            metrics_interval: float = DEFAULT_INTERVAL, tps_interval: float = DEFAULT_TPS_INTERVAL
+    ):
+        """Runs the server in the foreground.
+
+        The terminal is relayed to the server, and the control socket in the server
+        directory lets other processes (e.g. a hot backup) send commands to it.
+        Console output goes through a Console: with capture it is also written to
+        compressed files in `console/` in the server directory. With metrics_port,
+        process and TPS metrics are served as Prometheus text on that local port.
+        With cds (see __init__), the class archive of the core is used, or dumped at exit.
+        """
+        with_archive = self._prepare_class_archive()
+        started = time.monotonic()
+        server = self.spawn(stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        control = ControlServer(self.server_dir, server.stdin)
+        control.start()
+        self.console = Console(
+            server.stdout, capture=ConsoleCapture(self.server_dir / "console") if capture else None
         )
+        self.console.subscribe(None, lambda match, line: control.broadcast(line))
+        self.console.subscribe(DONE_PATTERN, self._report_startup(started, with_archive), once=True)
+        threading.Thread(target=self._relay_input, args=(control,), daemon=True).start()
+
+        collector = None
+        if metrics_port:
+            collector = MetricsCollector(metrics_interval)
+            collector.add_server(self.server_dir.name, lambda: server.pid if server.poll() is None else None)
+            polling = watch_console(collector, self.server_dir.name, self.console, control.send, tps_interval)
+            collector.serve(metrics_port)
+            print(f"Metrics: http://127.0.0.1:{metrics_port}/metrics")
 
         try:
             self._print_server(stop=False)
+            self.console.start()
             server.wait()
         except KeyboardInterrupt:
             self._print_server(stop=True)
-            if server.stdin:
-                server.stdin.write("stop\n")
-                server.stdin.flush()
+            try:
+                control.send("stop")
+            except OSError:
+                pass
             server.wait()
+        finally:
+            self.console.join()
+            control.close()
+            if collector:
+                polling.set()
+                collector.close()
 
     def add_server_icon(self, file_path: Path):
         file_path = file_path.resolve()
@@ -138,6 +321,24 @@ class ServerHandler:
 
         shutil.copy(file_path, icon_path)
 
+    @staticmethod
+    def send_command(
+            server_dir: Path, command: str, expect: str | None = None, timeout: float = DEFAULT_REPLY_TIMEOUT
+    ) -> list:
+        """Sends a command to the server running in server_dir and returns the console lines of its reply."""
+        with ControlClient(server_dir) as client:
+            return client.command(command, expect, timeout)
+
+    @staticmethod
+    def stop_running(
+            server_dir: Path, timeout: float = DEFAULT_STOP_TIMEOUT
+    ) -> float:
+        """Stops the server running in server_dir with `stop` and waits until it exited. Returns the seconds it took."""
+        started = time.monotonic()
+        with ControlClient(server_dir) as client:
+            client.stop(timeout)
+        return time.monotonic() - started
+
     @staticmethod
     def remove_server(server_dir):
         if isinstance(server_dir, Path):
@@ -156,37 +357,63 @@ class WorldHandler:
     ):
         self.server_dir: Path = server_dir
         self._current_world = []
+        self.snapshots = SnapshotStore(self.server_dir)
+        self.catalog = WorldCatalog(self.server_dir)
 
     def _get_current_world(self) -> list:
+        self._current_world.clear()
         for directory in self.server_dir.glob("world*"):
             if directory.is_dir():
                 self._current_world.append(directory)
         
         return self._current_world if self._current_world else None
         
-    def pack_current_world(
+    def _find_archive(
             self, name: str
+    ) -> Path | None:
+        for suffix in ARCHIVE_SUFFIXES:
+            archive_path = self.server_dir / (Path(name).with_suffix(".tar").stem + suffix)
+            if archive_path.exists():
+                return archive_path
+        return None
+
+    def _new_archive_path(
+            self, name: str, compression: str | None
     ) -> Path:
-        archive_path = self.server_dir / Path(name).with_suffix(".tar")
+        suffix = {None: ".tar", "gz": ".tar.gz", "xz": ".tar.xz"}[compression]
+        archive_path = self.server_dir / (Path(name).with_suffix(".tar").stem + suffix)
         
         if archive_path.exists():
-            raise FileExistsError(f"{archive_path.stem} exists")
+            raise FileExistsError(f"{archive_path.name} exists")
         
         if not archive_path.relative_to(self.server_dir):
             raise ValueError(f"{archive_path.name} has to be in {self.server_dir}")
-        
-        
-        current_world = self._get_current_world()
+
         packed_worlds = self._get_world_list()
         if packed_worlds:
-            if archive_path in packed_worlds:
+            if archive_name(archive_path) in packed_worlds:
                 raise FileExistsError(f"World with the same name exists: {archive_path}")
+        return archive_path
 
+    def _write_archive(
+            self, archive_path: Path, world: list, compression: str | None, level: int | None,
+            workers: int | None
+    ):
+        stats = write_archive(archive_path, world, compression, level, workers)
+        print(
+            f"{archive_path.name}: {stats['bytes_in'] / 1024 ** 2:.1f} MB -> {stats['bytes_out'] / 1024 ** 2:.1f} MB "
+            f"(ratio {stats['ratio']:.2f}), {stats['mb_per_s']:.1f} MB/s"
+        )
+
+    def pack_current_world(
+            self, name: str, compression: str | None = None, level: int | None = None,
+            workers: int | None = None
+    ) -> Path:
+        archive_path = self._new_archive_path(name, compression)
+        
+        current_world = self._get_current_world()
         if current_world:
-            with tarfile.open(archive_path, mode="w") as archive:
-                for dir in current_world:
-                    dir_path = self.server_dir / dir
-                    archive.add(dir_path, arcname=dir.name)
+            self._write_archive(archive_path, current_world, compression, level, workers)
         
         if archive_path.exists():
             for dir in self._current_world:
@@ -195,33 +422,181 @@ class WorldHandler:
             return archive_path
     
     def _get_world_list(self):
-        lst = [file.stem for file in self.server_dir.iterdir() if file.suffix == ".tar"]
+        lst = [archive_name(file) for file in self.server_dir.iterdir() if file.is_file() and archive_name(file)]
         return lst
     
     def unpack_world_from_archive(
-            self, name: str
-    ):
+            self, name: str, patterns: list | None = None, keep: bool = False, workers: int | None = None
+    ) -> int:
+        """Extracts a world archive, or only the members matching patterns.
+
+        A full restore needs the current world to be packed first, a selective
+        restore (e.g. one dimension or a region file) overwrites what it extracts.
+        A full restore removes the archive afterwards unless keep is set, a selective one always keeps it.
+        """
         
         current_world = self._get_current_world()
-        if not current_world:
-            archive_path = self.server_dir / Path(name).with_suffix(".tar")
-
-            if archive_path.exists():
-                with tarfile.open(archive_path, mode="r") as archive:
-                    archive.extractall(path=self.server_dir)
-                archive_path.unlink()
+        if not current_world or patterns:
+            archive_path = self._find_archive(name)
+
+            if archive_path:
+                extracted = extract_archive(archive_path, self.server_dir, patterns, workers)
+                if patterns and not extracted:
+                    raise FileNotFoundError(f"Nothing in {archive_path.name} matches {patterns}")
+                if not keep and not patterns:
+                    archive_path.unlink()
+                    index_path(archive_path).unlink(missing_ok=True)
+                return extracted
             else:
                 raise FileNotFoundError(f"World {name} was not found")
         else:
             raise FileExistsError("You have to save your current world first")
 
+    def snapshot_current_world(
+            self, name: str
+    ) -> dict:
+        """Snapshots the current world without removing it, only changed files are stored."""
+        current_world = self._get_current_world()
+        if not current_world:
+            raise FileNotFoundError(f"No world found in {self.server_dir}")
+        return self.snapshots.create(name, current_world, self.server_dir)
+
+    def hot_backup(
+            self, name: str, archive: bool = False, compression: str | None = None,
+            level: int | None = None, workers: int | None = None, timeout: float = 60
+    ) -> Path | dict:
+        """Backs up the world of a running server without stopping it or removing the world.
+
+        Saving is paused (`save-off`), everything is flushed to disk (`save-all flush`)
+        and, once the console confirms it, the world is snapshotted (or archived if
+        archive is set) before saving is resumed with `save-on`.
+        Returns the snapshot manifest or the archive path.
+        """
+        current_world = self._get_current_world()
+        if not current_world:
+            raise FileNotFoundError(f"No world found in {self.server_dir}")
+        archive_path = self._new_archive_path(name, compression) if archive else None
+
+        def backup():
+            if archive:
+                self._write_archive(archive_path, current_world, compression, level, workers)
+                return archive_path
+            return self.snapshots.create(name, current_world, self.server_dir)
+
+        try:
+            client = ControlClient(self.server_dir)
+        except ConnectionError:
+            print("No running server found, the world is backed up as it is on disk")
+            return backup()
+
+        with client:
+            client.send("save-off")
+            # from here on saving has to be resumed, whether the flush times out or not
+            try:
+                client.send("save-all flush")
+                client.wait_for(r"Saved the game", timeout)
+                return backup()
+            finally:
+                client.send("save-on")
+
+    def _ensure_stopped(self):
+        try:
+            client = ControlClient(self.server_dir)
+        except ConnectionError:
+            return
+        client.close()
+        raise RuntimeError("The server is running, stop it first")
+
+    def trim_world(
+            self, max_seconds: float = 0, areas: list | None = None, dry_run: bool = False,
+            workers: int | None = None, drop_damaged: bool = False
+    ) -> dict:
+        """Drops the chunks players spent at most max_seconds in (never visited ones by default).
+
+        areas are (dimension or None, x1, z1, x2, z2) block areas whose chunks are
+        always kept. Region files are trimmed in parallel across a process pool; one
+        with truncated chunks is left alone unless drop_damaged is set. Returns
+        {dimension: {"chunks", "dropped", "size", "new_size", "damaged"}}; with dry_run
+        nothing is written and new_size is what the files would shrink to.
+        """
+        current_world = self._get_current_world()
+        if not current_world:
+            raise FileNotFoundError(f"No world found in {self.server_dir}")
+        if not dry_run:
+            self._ensure_stopped()
+
+        jobs = []
+        for dimension, region_dir in region_dirs(current_world, self.server_dir).items():
+            dimension_areas = areas_for(dimension, areas or [])
+            jobs.extend(
+                (dimension, trim_region, (path, int(max_seconds * 20), dimension_areas, dry_run, drop_damaged))
+                for path in sorted(region_dir.glob("r.*.*.mca"))
+            )
+        return self._run_region_jobs(jobs, workers)
+
+    def compact_world(
+            self, level: int | None = None, dry_run: bool = False, workers: int | None = None,
+            drop_damaged: bool = False
+    ) -> dict:
+        """Rewrites every region, entities and poi file with its chunks packed back to back.
+
+        With level, chunks are also recompressed with zlib at that level. Files are
+        compacted in parallel across a process pool, each one is verified before it
+        replaces the old one. Files with truncated chunks are left alone unless
+        drop_damaged is set. Returns {dimension: {"files", "chunks", "rewritten",
+        "size", "new_size", "damaged"}}.
+        """
+        current_world = self._get_current_world()
+        if not current_world:
+            raise FileNotFoundError(f"No world found in {self.server_dir}")
+        if not dry_run:
+            self._ensure_stopped()
+
+        jobs = []
+        for dimension, region_dir in region_dirs(current_world, self.server_dir).items():
+            for directory in (region_dir, *(region_dir.parent / name for name in CHUNK_DATA_DIRS)):
+                jobs.extend(
+                    (dimension, compact_region, (path, level, dry_run, drop_damaged))
+                    for path in sorted(directory.glob("r.*.*.mca"))
+                )
+        return self._run_region_jobs(jobs, workers)
+
+    @staticmethod
+    def _run_region_jobs(
+            jobs: list, workers: int | None
+    ) -> dict:
+        """Runs (dimension, function, args) jobs across a process pool and sums their reports per dimension.
+
+        Lists in the reports (like the damaged files) are concatenated.
+        """
+        report = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(function, *args): dimension for dimension, function, args in jobs}
+            for future in as_completed(futures):
+                totals = report.setdefault(futures[future], {})
+                for key, value in future.result().items():
+                    totals[key] = totals[key] + value if key in totals else value
+        return report
+
+    def restore_snapshot(
+            self, name: str
+    ):
+        if self._get_current_world():
+            raise FileExistsError("You have to save your current world first")
+        self.snapshots.restore(name, self.server_dir)
+
+    def remove_snapshot(
+            self, name: str
+    ) -> int:
+        return self.snapshots.remove(name)
 
     def remove_world(
             self, name: str
     ):
-        world_path = self.server_dir / Path(name).with_suffix(".tar")
-        if world_path.exists():
+        world_path = self._find_archive(name)
+        if world_path:
             world_path.unlink()
+            index_path(world_path).unlink(missing_ok=True)
         else:
             raise FileNotFoundError(f"World {name} was not found")
     
@@ -230,56 +605,184 @@ class ModHandler:
     server_dir = ServerDir("server_dir", Path)
 
     def __init__(
-            self, server_dir
+            self, server_dir, cache: DownloadCache | None = None, store: PluginStore | None = None
     ):
         self.server_dir = server_dir
+        self.cache = cache
+        if store is None:
+            # next to the cache blobs, so both link to the same files
+            store = PluginStore(cache.root / "plugin-store") if cache else PluginStore()
+        self.store = store
 
         self.plugins_dir = self.server_dir / Path("plugins")
         if not self.plugins_dir.exists():
             self.plugins_dir.mkdir()
+
+        # opened by the first download_plugin that is given no session
+        self._session = None
+        self.manifest = DownloadManifest(self.plugins_dir)
+        self.index = PluginIndex(self.plugins_dir)
         
 
-    def download_plugin(
+    def _plugin_path(
             self, url: str
     ) -> Path:
-
         name = url.split("/")[-1]
         
         r_dot_index = name.rfind(".")
         name = name[:r_dot_index].replace(".", "_") + name[r_dot_index:]
 
-        name = self.plugins_dir / Path(name)
+        return self.plugins_dir / Path(name)
+
+    def _fetch(
+            self, url: str, file_name: Path, session: requests.Session, refresh: bool = False
+    ) -> dict:
+        plugin_download = lambda url, path: download(url, path, session)
+        if self.cache:
+            return self.cache.fetch(url, file_name, plugin_download, refresh)
+        return plugin_download(url, file_name)
+
+    def _fetch_plugin(
+            self, url: str, path: Path, session: requests.Session, refresh: bool = False
+    ) -> dict:
+        meta = self._fetch(url, path, session, refresh)
+        # the jar in plugins/ becomes a link of the shared copy in the store; only a jar
+        # linked from the download cache is a read-only copy the store may hardlink
+        self.store.install(self.store.add(path, meta.get("sha256"), link=self.cache is not None), path)
+        return meta
+
+    def _download_plugin(
+            self, url: str, session: requests.Session
+    ) -> tuple:
+        name = self._plugin_path(url)
+        meta = self._fetch_plugin(url, name, session)
+        self.manifest.record(name, url, meta)
+        return name.resolve(), meta
 
-        with requests.get(url, stream=True) as response:
-            response.raise_for_status()
-            block_size = 4096
+    def download_plugin(
+            self, url: str, session: requests.Session | None = None
+    ) -> Path:
 
-            with open(name, "wb") as file:
-                for chunk in response.iter_content(chunk_size=block_size):
-                    file.write(chunk)
-            
+        if session is None:
+            if self._session is None:
+                self._session = make_session()
+            session = self._session
+        plugin_path, meta = self._download_plugin(url, session)
+        print(f"{plugin_path} ({describe_download(meta)})")
         
-        return name.resolve()
+        return plugin_path
     
     def download_plugins_bulk(
-            self, file_name: Path
+            self, file_name: Path, workers: int = 8, sources: dict | None = None
     ) -> list:
         file_path = file_name.resolve()
         if not file_path.exists():
             raise FileNotFoundError(f"{file_path} not found")
         
-        download_paths = []
         with open(file_path, "r") as file:
-            for link in file:
-                link = link.strip()
-                if not link:
+            return self.install_plugins(list(file), workers, sources)
+
+    def install_plugins(
+            self, urls, workers: int = 8, sources: dict | None = None, strict: bool = False
+    ) -> list:
+        """Downloads plugins and then the dependencies they miss, and checks the result.
+
+        sources maps plugin names to download urls. After the given urls, every
+        depend entry no installed plugin provides is downloaded from sources, all
+        of one round concurrently, until nothing more can be added. Missing or
+        cyclic dependencies left are printed. With strict, failed downloads raise
+        (see download_plugins).
+        """
+        download_paths = self.download_plugins(urls, workers, strict)
+        requested = set()
+        while sources:
+            report = self.resolve_dependencies()
+            wanted = sorted({
+                dependency for dependencies in report["missing"].values() for dependency in dependencies
+                if dependency in sources and dependency not in requested
+            })
+            if not wanted:
+                break
+            print(f"Downloading missing dependencies: {', '.join(wanted)}")
+            requested.update(wanted)
+            download_paths += self.download_plugins([sources[name] for name in wanted], workers, strict)
+
+        for line in problems(self.resolve_dependencies()):
+            print(f"WARNING: {line}")
+        return download_paths
+
+    def download_plugins(
+            self, urls, workers: int = 8, strict: bool = False
+    ) -> list:
+        """Downloads plugins concurrently and returns their paths.
+
+        Failed downloads are printed; with strict a RuntimeError listing them is
+        raised once every download finished.
+        """
+        links = []
+        targets = {}
+        failures = []
+        for link in urls:
+            link = link.strip()
+            if not link or link in links:
+                continue
+            target = self._plugin_path(link)
+            if target in targets:
+                # two urls would be written to the same file in plugins/
+                failures.append((link, f"same file name as {targets[target]}"))
+                continue
+            targets[target] = link
+            links.append(link)
+
+        total = len(links)
+        workers = max(1, min(workers, total))
+        session = make_session(pool_size=workers)
+
+        download_paths = []
+        with session, ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self._download_plugin, link, session): link for link in links
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                link = futures[future]
+                try:
+                    plugin_path, meta = future.result()
+                except Exception as e:
+                    failures.append((link, e))
+                    print(f"[{done}/{total}] FAILED {link}: {e}")
                     continue
-                plugin_path = self.download_plugin(link)
-                print(plugin_path)
+                print(f"[{done}/{total}] {plugin_path} ({describe_download(meta)})")
                 download_paths.append(plugin_path)
 
+        if failures:
+            print(f"{len(failures)} plugin download(s) failed:")
+            for link, error in failures:
+                print(f"  {link}: {error}")
+            if strict:
+                raise RuntimeError(
+                    f"{len(failures)} plugin download(s) failed: {', '.join(link for link, _ in failures)}"
+                )
+
         return download_paths
     
+    def update_plugins(
+            self, workers: int = 8
+    ) -> list:
+        if not self.manifest.entries:
+            raise FileNotFoundError(f"No downloaded plugins recorded in {self.manifest.path}")
+
+        session = make_session(pool_size=workers)
+        with session:
+            updated, unchanged, failures = revalidate(
+                self.manifest,
+                self.plugins_dir,
+                lambda url, file_name: self._fetch_plugin(url, file_name, session, refresh=True),
+                session,
+                workers
+            )
+        print(f"{len(updated)} updated, {len(unchanged)} unchanged, {len(failures)} failed")
+        return updated
+
     def remove_plugin(
             self, name:str
     ):
@@ -288,6 +791,7 @@ class ModHandler:
             raise FileNotFoundError(f"{path} plugin does not exist")
         
         path.unlink()
+        self.manifest.forget(path)
         print(f"{path.name} removed.")
 
     def remove_all_plugins(self):
@@ -315,25 +819,76 @@ class ModHandler:
 
    # toggle all plugins
 
-    def get_plugin_names(self) -> list:
-        plugins = sorted([plugin.resolve() for plugin in self.plugins_dir.iterdir() if plugin.suffix == ".jar" or plugin.suffix == ".disabled"])
+    def list_plugins(self) -> list:
+        """Returns the indexed plugins (see PluginIndex), sorted by file name."""
+        plugins = self.index.list()
         if not plugins:
             raise FileNotFoundError(f"No plugins were found in {self.plugins_dir}")
+        return plugins
+
+    def resolve_dependencies(self) -> dict:
+        """Resolves the depend, softdepend and loadbefore entries of the enabled plugins (see dependencies.resolve)."""
+        return resolve([plugin for plugin in self.index.list() if plugin["enabled"]])
+
+    def check_dependencies(self) -> dict:
+        """Raises RuntimeError if the plugins would fail to load (see dependencies.problems).
+
+        That is a jar that can not be read, a missing dependency, plugins depending
+        on each other or a plugin installed twice.
+        """
+        report = self.resolve_dependencies()
+        found = problems(report)
+        if found:
+            raise RuntimeError("Plugins would fail to load:\n  " + "\n  ".join(found))
+        return report
+
+    def get_plugin_names(self) -> list:
         plugin_names = []
-        for name in plugins:
-            if name.suffix == ".jar":
-                item = str(name.stem)
-                plugin_names.append(item)
-            elif name.suffix == ".disabled":
-                item = f"{str(name.stem)} (disabled)"
-                plugin_names.append(item)
-            else:
-                raise ValueError(f"Unknown item in {plugins}")
-        
+        for plugin in self.list_plugins():
+            stem = Path(plugin["file"]).stem
+            plugin_names.append(stem if plugin["enabled"] else f"{stem} (disabled)")
         return plugin_names
     
-    # remove plugin directory
-    # add a method that will pack uhhhhh the fkn plugins in a tar archive
+    def pack_plugins(
+            self, name: str
+    ) -> dict:
+        """Records the jars in plugins/ as the plugin set name in the store (see PluginStore)."""
+        plugin_set = self.store.create_set(name, self.plugins_dir, self.manifest.entries)
+        if not plugin_set["plugins"]:
+            self.store.remove_set(name)
+            raise FileNotFoundError(f"No plugins found in {self.plugins_dir}")
+        return plugin_set
+
+    def restore_plugins(
+            self, name: str
+    ) -> dict:
+        """Makes the jars in plugins/ exactly the ones of a plugin set.
+
+        Jars that are not in the set are removed, jars that are already the stored
+        ones are kept, the rest are linked from the store. Plugin data folders
+        are left alone. Returns {"linked", "kept", "removed"} counts.
+        """
+        plugin_set = self.store.read_set(name)
+        wanted = plugin_set["plugins"]
+        report = {"linked": 0, "kept": 0, "removed": 0}
+
+        for path in self.plugins_dir.iterdir():
+            if path.suffix in PLUGIN_SUFFIXES and path.is_file() and path.name not in wanted:
+                path.unlink()
+                if not any(Path(file).stem == path.stem for file in wanted):
+                    self.manifest.forget(path)
+                report["removed"] += 1
+
+        for file_name, entry in wanted.items():
+            path = self.plugins_dir / file_name
+            if self.store.install(entry["sha256"], path) is None:
+                report["kept"] += 1
+            else:
+                report["linked"] += 1
+            if entry.get("download"):
+                self.manifest.record(path, entry["download"]["url"], entry["download"])
+        return report
+
 
 class PropertiesHandler:
     """Class that handles server properties"""
@@ -348,49 +903,39 @@ class PropertiesHandler:
         if not properties_file.exists():
             # raise FileNotFoundError("server properties file not found")
             properties_file.touch()
-        self.properties_file = properties_file    
+        self.properties_file = properties_file
+
+        self.properties = Properties(self.properties_file)
+
+    def set_params(
+            self, params: dict, dry_run: bool = False
+    ) -> dict:
+        """Changes every param in one atomic write, params missing from the file are appended.
+
+        Nothing is written if no value changes. Returns {param: (old value or None, new value)}
+        of the changed params; with dry_run the file is left as it is.
+        """
+        if not isinstance(params, dict):
+            raise ValueError("provide the params as a dict of names and values")
+        changes = self.properties.update(params)
+        if dry_run:
+            self.properties.load()
+        else:
+            self.properties.save()
+        return changes
 
-    def _read(self) -> str:
-        with open(self.properties_file, "r") as file:
-            return file.read()
-        
-    def _write(
-            self,
-            old: str,
-            new: str
-    ):
-        if not isinstance(old, str) and not isinstance(new, str):
-            raise ValueError("provide string arguments")
-        
-        text = self._read()
-        text = text.replace(old, new)
-        with open(self.properties_file, "w") as file:
-            file.write(text)
-
-    def _find_value(self, param: str):
-        if not isinstance(param, str):
-            raise ValueError("provde param of type str")
-        
-        with open(self.properties_file, "r") as file:
-            for line in file:
-                line = line.strip()
-                if not line or "=" not in line:
-                    continue
-                key, value = line.split("=", 1)
+    def apply(
+            self, file_path: Path, dry_run: bool = False
+    ) -> dict:
+        """Applies the params of a JSON object file as one batch (see set_params)."""
+        with open(file_path, "r") as file:
+            params = json.load(file)
+        return self.set_params(params, dry_run)
 
-                if key == param:
-                    return value
-        return None
-    
     def _change_param(self, param, new_value):
-        old_value = self._find_value(param)
-        if not old_value:
+        if param not in self.properties:
             raise KeyError(f"{param=} was not found in properties file")
-        
-        self._write(
-            f'{param}={old_value}',
-            f'{param}={new_value}'
-        )
+        self.set_params({param: new_value})
     
     def change_port(self, new_port: str | int):
         self._change_param(
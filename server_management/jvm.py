@@ -0,0 +1,112 @@
+import re
+import subprocess
+
+PROFILES = ("auto", "aikar", "zgc", "shenandoah", "none")
+DEFAULT_JVM = {
+    # only -Xms/-Xmx unless a profile is chosen, like before profiles existed
+    "profile": "none",
+    # False, True (hugetlbfs pages, set up by the admin) or "transparent"
+    "large_pages": False,
+    # None lets the profile decide
+    "pre_touch": None,
+    "extra_args": [],
+}
+# from this max heap (GB) on, auto picks ZGC when the JVM has a generational one
+LARGE_HEAP = 16
+
+# https://docs.papermc.io/paper/aikars-flags
+AIKAR_FLAGS = [
+    "-XX:+UseG1GC", "-XX:+ParallelRefProcEnabled", "-XX:MaxGCPauseMillis=200",
+    "-XX:+UnlockExperimentalVMOptions", "-XX:+DisableExplicitGC",
+    "-XX:G1HeapWastePercent=5", "-XX:G1MixedGCCountTarget=4", "-XX:G1MixedGCLiveThresholdPercent=90",
+    "-XX:G1RSetUpdatingPauseTimePercent=5", "-XX:SurvivorRatio=32", "-XX:+PerfDisableSharedMem",
+    "-XX:MaxTenuringThreshold=1", "-Dusing.aikars.flags=https://mcflags.emc.gs", "-Daikars.new.flags=true",
+]
+# G1 sizes for heaps up to 12 GB and above
+AIKAR_SMALL_HEAP = [
+    "-XX:G1NewSizePercent=30", "-XX:G1MaxNewSizePercent=40", "-XX:G1HeapRegionSize=8M",
+    "-XX:G1ReservePercent=20", "-XX:InitiatingHeapOccupancyPercent=15",
+]
+AIKAR_LARGE_HEAP = [
+    "-XX:G1NewSizePercent=40", "-XX:G1MaxNewSizePercent=50", "-XX:G1HeapRegionSize=16M",
+    "-XX:G1ReservePercent=15", "-XX:InitiatingHeapOccupancyPercent=20",
+]
+PAUSELESS_FLAGS = ["-XX:+DisableExplicitGC", "-XX:+PerfDisableSharedMem"]
+
+_version_outputs = {}
+
+
+def _version_output(java_path: str) -> str:
+    if java_path not in _version_outputs:
+        try:
+            _version_outputs[java_path] = subprocess.run(
+                [java_path, "-version"], capture_output=True, text=True, timeout=30
+            ).stderr
+        except (OSError, subprocess.TimeoutExpired):
+            _version_outputs[java_path] = ""
+    return _version_outputs[java_path]
+
+
+def java_version(java_path: str) -> int | None:
+    """Returns the feature version (8, 17, 21...) of a java executable, or None if it can not be run."""
+    match = re.search(r'version "(\d+)(?:\.(\d+))?', _version_output(java_path))
+    if not match:
+        return None
+    # "1.8.0_392" is Java 8
+    return int(match.group(2)) if match.group(1) == "1" and match.group(2) else int(match.group(1))
+
+
+def java_build(java_path: str) -> str:
+    """Returns the full `java -version` text, which changes with every JDK update."""
+    return _version_output(java_path)
+
+
+def jvm_options(options: dict | None) -> dict:
+    jvm = {**DEFAULT_JVM, **(options or {})}
+    if jvm["profile"] not in PROFILES:
+        raise ValueError(f"Unknown JVM profile {jvm['profile']}, use one of: {', '.join(PROFILES)}")
+    if jvm["large_pages"] not in (False, True, "transparent"):
+        raise ValueError("large_pages has to be false, true or \"transparent\"")
+    return jvm
+
+
+def resolve_profile(profile: str, max_ram: int, version: int | None) -> str:
+    """Picks the profile for "auto": ZGC for large heaps on Java 21+, Aikar's G1 flags otherwise."""
+    if profile != "auto":
+        return profile
+    if version and version >= 21 and max_ram >= LARGE_HEAP:
+        return "zgc"
+    return "aikar"
+
+
+def jvm_args(
+        options: dict | None, ram: tuple, version: int | None
+) -> list:
+    """Returns the JVM flags (without -Xms/-Xmx) of a profile for a (min, max) heap in GB."""
+    jvm = jvm_options(options)
+    profile = resolve_profile(jvm["profile"], ram[1], version)
+
+    args = []
+    if profile == "aikar":
+        args += AIKAR_FLAGS + (AIKAR_LARGE_HEAP if ram[1] > 12 else AIKAR_SMALL_HEAP)
+    elif profile == "zgc":
+        if version and version < 15:
+            raise ValueError(f"ZGC needs Java 15 or newer, found Java {version}")
+        args += ["-XX:+UseZGC"]
+        if version in (21, 22):
+            # generational ZGC is opt-in before Java 23
+            args += ["-XX:+ZGenerational"]
+        args += PAUSELESS_FLAGS
+    elif profile == "shenandoah":
+        if version and version < 12:
+            raise ValueError(f"Shenandoah needs Java 12 or newer, found Java {version}")
+        args += ["-XX:+UseShenandoahGC"] + PAUSELESS_FLAGS
+
+    pre_touch = jvm["pre_touch"] if jvm["pre_touch"] is not None else profile != "none"
+    if pre_touch:
+        args.append("-XX:+AlwaysPreTouch")
+    if jvm["large_pages"] == "transparent":
+        args.append("-XX:+UseTransparentHugePages")
+    elif jvm["large_pages"]:
+        args += ["-XX:+UseLargePages", "-XX:LargePageSizeInBytes=2m"]
+    return args + list(jvm["extra_args"])
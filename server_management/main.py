@@ -1,8 +1,15 @@
+import fnmatch
 import traceback
 import json
+import time
 from pathlib import Path
 
+from .cache import DownloadCache
+from .fleet import Fleet, expand_servers
 from .handlers import CoreHandler, ServerHandler, WorldHandler, ModHandler, PropertiesHandler
+from .metrics import DEFAULT_INTERVAL, DEFAULT_TPS_INTERVAL
+from .regions import parse_area
+from .supervisor import DEFAULT_STOP_TIMEOUT
 
 
 class Main:
@@ -11,30 +18,54 @@ class Main:
     def __init__(
             self,
             server_dir: Path,
+            cache: DownloadCache | None = None
     ):
     
         self.server_dir = server_dir
+        # the cache and the handlers that download are created on first use,
+        # so commands that download nothing leave ~/.cache alone
+        self._cache = cache
 
-
-        self._core_handler = CoreHandler(self.server_dir)
+        self._core = None
         self._server_handler = None
         self._world_handler = WorldHandler(self.server_dir)
-        self._mod_handler = ModHandler(self.server_dir)
+        self._mods = None
         self._properties_handler = PropertiesHandler(self.server_dir)
 
+    def _download_cache(self) -> DownloadCache:
+        if self._cache is None:
+            self._cache = DownloadCache()
+        return self._cache
+
+    @property
+    def _core_handler(self) -> CoreHandler:
+        if self._core is None:
+            self._core = CoreHandler(self.server_dir, self._download_cache())
+        return self._core
+
+    @property
+    def _mod_handler(self) -> ModHandler:
+        if self._mods is None:
+            self._mods = ModHandler(self.server_dir, self._download_cache())
+        return self._mods
+
     def _init_server_handler(
             self,
             server_dir: Path, #self.server_dir,
             server_core: Path,
             ram: tuple,
-            java_path: Path | str = "java"
+            java_path: Path | str = "java",
+            jvm: dict | None = None,
+            cds: bool = False
     ):
         if not self._server_handler:
             self._server_handler = ServerHandler(
                 self.server_dir,
                 server_core,
                 ram,
-                java_path
+                java_path,
+                jvm,
+                cds
             )
         
     @staticmethod
@@ -58,18 +89,24 @@ class Main:
     
     @catch_exceptions
     def install_paper_core(
-            self, version: str, build: str
+            self, version: str, build: str = "latest-stable"
     ):
         downloaded_core = self._core_handler.install_paper_core(version, build)
         return downloaded_core
 
     @catch_exceptions
     def install_other_core(
-        self, url: str
+        self, url: str, connections: int = 4
     ):
+        self._core_handler.connections = connections
         downloaded_core = self._core_handler.install_other_core(url)
         return downloaded_core
     
+    @catch_exceptions
+    def update_cores(self) -> list:
+        updated_cores = self._core_handler.update_cores()
+        return updated_cores
+
     @catch_exceptions
     def remove_core(
         self, name = None
@@ -82,16 +119,67 @@ class Main:
         self,
         server_core,
         ram,
-        java_path = "java"
+        java_path = "java",
+        capture: bool = False,
+        metrics_port: int | None = None,
+        metrics_interval: float = DEFAULT_INTERVAL,
+        tps_interval: float = DEFAULT_TPS_INTERVAL,
+        jvm: dict | None = None,
+        cds: bool = False,
+        check_plugins: bool = True
     ):
         self._init_server_handler(
             self.server_dir,
             server_core,
             ram,
-            java_path = "java"
+            java_path,
+            jvm,
+            cds
         )
+        if check_plugins:
+            # a missing dependency should fail here, not minutes into the boot
+            self._mod_handler.check_dependencies()
         
-        self._server_handler.start_server()
+        self._server_handler.start_server(capture, metrics_port, metrics_interval, tps_interval)
+
+    @catch_exceptions
+    def train_cds(
+        self,
+        server_core,
+        ram,
+        java_path = "java",
+        jvm: dict | None = None,
+        timeout: float = 600
+    ) -> float:
+        self._init_server_handler(
+            self.server_dir,
+            server_core,
+            ram,
+            java_path,
+            jvm,
+            cds=True
+        )
+        startup = self._server_handler.train_class_archive(timeout)
+        archive = self._server_handler.class_archive.path
+        print(
+            f"Class archive {archive.name} written ({archive.stat().st_size / 1024 ** 2:.1f} MB), "
+            f"startup without it: {startup:.1f}s"
+        )
+        return startup
+
+    @catch_exceptions
+    def send_command(
+        self, command: str, expect: str | None = None, timeout: float = 10
+    ) -> list:
+        reply = ServerHandler.send_command(self.server_dir, command, expect, timeout)
+        print("".join(reply), end="")
+        return reply
+
+    @catch_exceptions
+    def stop_server(self, timeout: float = DEFAULT_STOP_TIMEOUT) -> float:
+        took = ServerHandler.stop_running(self.server_dir, timeout)
+        print(f"Server stopped in {took:.1f}s")
+        return took
 
     @catch_exceptions
     def add_icon_sever(
@@ -106,24 +194,157 @@ class Main:
         ServerHandler.remove_server(server_dir)
 
 
+    # Download Cache Shi-
+    @staticmethod
+    @catch_exceptions
+    def cache_stats():
+        stats = DownloadCache().stats()
+        print(f"Path: {stats['path']}")
+        print(f"Files: {stats['files']} ({stats['urls']} urls)")
+        print(f"Size: {stats['size'] / 1024 ** 2:.1f} MB of {stats['max_size'] / 1024 ** 2:.1f} MB")
+        return stats
+
+    @staticmethod
+    @catch_exceptions
+    def cache_prune(max_size_mb: int | None = None):
+        max_size = max_size_mb * 1024 ** 2 if max_size_mb is not None else None
+        removed, freed = DownloadCache().prune(max_size)
+        print(f"Removed {removed} files, freed {freed / 1024 ** 2:.1f} MB")
+        return removed, freed
+
+
     # World Handler Shi-
     @catch_exceptions
-    def pack_world(self, name: str) -> Path:
-        packed_world = self._world_handler.pack_current_world(name)
+    def pack_world(
+        self, name: str, compression: str | None = None, level: int | None = None, workers: int | None = None
+    ) -> Path:
+        packed_world = self._world_handler.pack_current_world(name, compression, level, workers)
         return packed_world
     
     @catch_exceptions
-    def unpack_world(self, name: str):
-        self._world_handler.unpack_world_from_archive(name)
+    def unpack_world(
+        self, name: str, patterns: list | None = None, keep: bool = False, workers: int | None = None
+    ):
+        extracted = self._world_handler.unpack_world_from_archive(name, patterns, keep, workers)
+        print(f"Extracted {extracted} files and directories from {name}")
 
     @catch_exceptions
     def remove_world(self, name: str):
         self._world_handler.remove_world(name)
 
     @catch_exceptions
-    def list_world(self):
-        for world in self._world_handler._get_world_list():
-            print(world)
+    def snapshot_world(self, name: str) -> dict:
+        manifest = self._world_handler.snapshot_current_world(name)
+        print(
+            f"Snapshot {name}: {len(manifest['files'])} files, {manifest['size'] / 1024 ** 2:.1f} MB, "
+            f"{manifest['written'] / 1024 ** 2:.1f} MB new"
+        )
+        return manifest
+
+    @catch_exceptions
+    def backup_world(
+        self, name: str, archive: bool = False, compression: str | None = None, level: int | None = None,
+        workers: int | None = None
+    ):
+        backup = self._world_handler.hot_backup(name, archive, compression, level, workers)
+        if not archive:
+            print(
+                f"Snapshot {name}: {len(backup['files'])} files, {backup['size'] / 1024 ** 2:.1f} MB, "
+                f"{backup['written'] / 1024 ** 2:.1f} MB new"
+            )
+        return backup
+
+    @staticmethod
+    def _print_damaged(damaged: list):
+        if damaged:
+            print(f"{len(damaged)} files have truncated chunks and were left as they are (see --drop-damaged):")
+            for path in sorted(damaged):
+                print(f"  {path}")
+
+    @catch_exceptions
+    def trim_world(
+        self, max_seconds: float = 0, areas: list | None = None, dry_run: bool = False,
+        workers: int | None = None, drop_damaged: bool = False
+    ) -> dict:
+        areas = [parse_area(area) for area in areas or []]
+        report = self._world_handler.trim_world(max_seconds, areas, dry_run, workers, drop_damaged)
+        reclaimed = 0
+        damaged = []
+        for dimension, totals in sorted(report.items()):
+            saved = totals["size"] - totals["new_size"]
+            reclaimed += saved
+            damaged += totals["damaged"]
+            print(
+                f"{dimension}: {totals['dropped']} of {totals['chunks']} chunks, "
+                f"{saved / 1024 ** 2:.1f} MB {'reclaimable' if dry_run else 'reclaimed'}"
+            )
+        print(f"{'Would reclaim' if dry_run else 'Reclaimed'} {reclaimed / 1024 ** 2:.1f} MB in total")
+        self._print_damaged(damaged)
+        return report
+
+    @catch_exceptions
+    def compact_world(
+        self, level: int | None = None, dry_run: bool = False, workers: int | None = None,
+        drop_damaged: bool = False
+    ) -> dict:
+        report = self._world_handler.compact_world(level, dry_run, workers, drop_damaged)
+        saved = 0
+        damaged = []
+        for dimension, totals in sorted(report.items()):
+            saved += totals["size"] - totals["new_size"]
+            damaged += totals["damaged"]
+            print(
+                f"{dimension}: {totals['size'] / 1024 ** 2:.1f} MB -> {totals['new_size'] / 1024 ** 2:.1f} MB "
+                f"({totals['rewritten']} of {totals['files']} files {'to rewrite' if dry_run else 'rewritten'})"
+            )
+        print(f"{'Would save' if dry_run else 'Saved'} {saved / 1024 ** 2:.1f} MB in total")
+        self._print_damaged(damaged)
+        return report
+
+    @catch_exceptions
+    def restore_snapshot(self, name: str):
+        self._world_handler.restore_snapshot(name)
+
+    @catch_exceptions
+    def remove_snapshot(self, name: str):
+        freed = self._world_handler.remove_snapshot(name)
+        print(f"Snapshot {name} removed, freed {freed / 1024 ** 2:.1f} MB")
+
+    @catch_exceptions
+    def list_world(
+            self, pattern: str | None = None, version: str | None = None, sort: str = "created",
+            reverse: bool = False, as_json: bool = False
+    ) -> dict:
+        archives = self._world_handler.catalog.list(pattern, version, sort, reverse)
+        snapshots = []
+        if not version:
+            # snapshots carry no level.dat fields, so a version filter leaves them out
+            snapshots = [
+                snapshot for snapshot in self._world_handler.snapshots.list()
+                if not pattern or fnmatch.fnmatchcase(snapshot["name"], pattern)
+            ]
+            key = {"name": "name", "size": "size", "members": "files"}.get(sort, "created")
+            snapshots.sort(key=lambda snapshot: snapshot[key], reverse=reverse)
+
+        if as_json:
+            print(json.dumps({"archives": archives, "snapshots": snapshots}, indent=2))
+            return {"archives": archives, "snapshots": snapshots}
+
+        for archive in archives:
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(archive["created"]))
+            details = [created, f"{archive['members']} members", f"{archive['size'] / 1024 ** 2:.1f} MB"]
+            if archive["version"]:
+                details.append(archive["version"])
+            if archive["seed"] is not None:
+                details.append(f"seed {archive['seed']}")
+            print(f"{archive['name']} ({', '.join(details)})")
+        for snapshot in snapshots:
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(snapshot["created"]))
+            print(
+                f"{snapshot['name']} (snapshot, {created}, {snapshot['files']} files, "
+                f"{snapshot['size'] / 1024 ** 2:.1f} MB)"
+            )
+        return {"archives": archives, "snapshots": snapshots}
 
     # Mod Handler Shi-
 
@@ -133,10 +354,28 @@ class Main:
         return downloaded_plugin
 
     @catch_exceptions
-    def bulk_plugin(self, file_name: Path) -> list:
-        list_of_plugin_paths = self._mod_handler.download_plugins_bulk(file_name)
+    def bulk_plugin(self, file_name: Path, workers: int = 8, sources_file: Path | None = None) -> list:
+        sources = None
+        if sources_file:
+            with open(sources_file, "r") as file:
+                sources = json.load(file)
+        list_of_plugin_paths = self._mod_handler.download_plugins_bulk(file_name, workers, sources)
         return list_of_plugin_paths
+
+    @catch_exceptions
+    def check_plugins(self) -> dict:
+        report = self._mod_handler.check_dependencies()
+        print(f"Load order: {', '.join(report['order'])}")
+        for plugin, dependencies in sorted(report["soft_missing"].items()):
+            print(f"{plugin} can use {', '.join(dependencies)} (not installed)")
+        print(f"{len(report['order'])} plugins, every dependency is installed")
+        return report
     
+    @catch_exceptions
+    def update_plugins(self, workers: int = 8) -> list:
+        list_of_plugin_paths = self._mod_handler.update_plugins(workers)
+        return list_of_plugin_paths
+
     @catch_exceptions
     def remove_plugin(self, name: str):
         self._mod_handler.remove_plugin(name)
@@ -151,6 +390,39 @@ class Main:
     ):
         self._mod_handler.toggle_plugin(name, disable)
 
+    @catch_exceptions
+    def pack_plugins(self, name: str) -> dict:
+        plugin_set = self._mod_handler.pack_plugins(name)
+        print(f"Plugin set {name}: {len(plugin_set['plugins'])} plugins, {plugin_set['size'] / 1024 ** 2:.1f} MB")
+        return plugin_set
+
+    @catch_exceptions
+    def restore_plugins(self, name: str) -> dict:
+        started = time.perf_counter()
+        report = self._mod_handler.restore_plugins(name)
+        print(
+            f"Plugin set {name}: {report['linked']} linked, {report['kept']} kept, {report['removed']} removed "
+            f"({(time.perf_counter() - started) * 1000:.0f} ms)"
+        )
+        return report
+
+    @catch_exceptions
+    def list_plugin_sets(self) -> list:
+        plugin_sets = self._mod_handler.store.list_sets()
+        for plugin_set in plugin_sets:
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(plugin_set["created"]))
+            print(
+                f"{plugin_set['name']} ({created}, {len(plugin_set['plugins'])} plugins, "
+                f"{plugin_set['size'] / 1024 ** 2:.1f} MB)"
+            )
+        return plugin_sets
+
+    @catch_exceptions
+    def remove_plugin_set(self, name: str) -> int:
+        freed = self._mod_handler.store.remove_set(name)
+        print(f"Plugin set {name} removed, freed {freed / 1024 ** 2:.1f} MB")
+        return freed
+
     @catch_exceptions
     def get_plugin_name(self, display: bool) -> list:
         list_of_plugin_names = self._mod_handler.get_plugin_names()
@@ -160,6 +432,27 @@ class Main:
                 print(plugin_name)
 
         return list_of_plugin_names
+
+    @catch_exceptions
+    def list_plugins(self, as_json: bool = False) -> list:
+        plugins = self._mod_handler.list_plugins()
+        if as_json:
+            print(json.dumps(plugins, indent=2))
+            return plugins
+
+        for plugin in plugins:
+            if plugin["error"]:
+                print(f"{plugin['file']} (unreadable: {plugin['error']})")
+                continue
+            details = [plugin["version"] or "no version"]
+            if plugin["api_version"]:
+                details.append(f"API {plugin['api_version']}")
+            if plugin["depend"]:
+                details.append(f"depends on {', '.join(plugin['depend'])}")
+            if not plugin["enabled"]:
+                details.append("disabled")
+            print(f"{plugin['name']} ({', '.join(details)}) - {plugin['file']}")
+        return plugins
     
 
     # Propereties Hanlder shi-
@@ -176,6 +469,19 @@ class Main:
             param, new_value
         )
 
+    @catch_exceptions
+    def apply_properties(self, file_name: Path, dry_run: bool = False) -> dict:
+        changes = self._properties_handler.apply(file_name, dry_run)
+        for param, (old, new) in changes.items():
+            print(f"{param}: {old if old is not None else '(new)'} -> {new}")
+        if not changes:
+            print("Nothing to change")
+        elif dry_run:
+            print(f"{len(changes)} properties would change, nothing was written")
+        else:
+            print(f"Changed {len(changes)} properties")
+        return changes
+
 class Config:
     def __init__(
             self,
@@ -218,8 +524,8 @@ class Config:
 
             if url:
                 core_path = self._main.install_other_core(url)
-            elif version and build:
-                core_path = self._main.install_paper_core(version, build)
+            elif version:
+                core_path = self._main.install_paper_core(version, build or "latest-stable")
             else:
                 raise ValueError
             
@@ -228,12 +534,46 @@ class Config:
         return core
     
     
+    def _run_fleet(self):
+        fleet = Fleet(
+            expand_servers(self._data),
+            self._data.get("workers", 4),
+            self._data.get("stop_timeout", DEFAULT_STOP_TIMEOUT),
+            self._data.get("metrics_port"),
+            self._data.get("metrics_interval", DEFAULT_INTERVAL)
+        )
+        ready, failures = fleet.provision()
+        if failures:
+            print(f"{len(failures)} of {len(fleet.servers)} servers failed to provision")
+        if ready:
+            fleet.run(ready)
+
+    def sync(self, dry_run: bool = False) -> list:
+        """Only writes the config files of a fleet config's servers, without provisioning or starting them."""
+        self._get_config()
+        if "servers" not in self._data:
+            raise ValueError("Only fleet configs (with a \"servers\" list) can be synced")
+        started = time.perf_counter()
+        fleet = Fleet(expand_servers(self._data), self._data.get("workers", 4))
+        changes = fleet.sync_configs(dry_run)
+        files = len({change["path"] for change in changes})
+        servers = len({change["server"] for change in changes})
+        action = "would change" if dry_run else "changed"
+        print(f"{files} files {action} in {servers} of {len(fleet.servers)} servers ({time.perf_counter() - started:.2f}s)")
+        return changes
+
     def __call__(self):
         self._get_config()
+        if "servers" in self._data:
+            # fleet config: a list of servers, optionally with a shared template
+            self._run_fleet()
+            return
         self._load_main()
         core = self._load_core()
         self._main.start_server(
             core,
             (self._data["server"]["ram"][0], self._data["server"]["ram"][1]),
-            self._data["server"]["java_path"]
+            self._data["server"]["java_path"],
+            jvm=self._data["server"].get("jvm"),
+            cds=self._data["server"].get("cds", False)
         )
\ No newline at end of file
@@ -0,0 +1,199 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .console import DONE_PATTERN
+
+DEFAULT_INTERVAL = 15
+DEFAULT_TPS_INTERVAL = 60
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+# Paper: "TPS from last 1m, 5m, 15m: 20.0, 20.0, 20.0" (a * marks a capped value)
+TPS_PATTERN = r"TPS from last 1m, 5m, 15m: \*?([\d.]+), \*?([\d.]+), \*?([\d.]+)"
+TPS_WINDOWS = ("1m", "5m", "15m")
+# Paper: "◴ 1.2/0.8/3.4, 1.1/0.7/3.4, 1.3/0.6/9.9" below "Server tick times (avg/min/max) from last 5s, 10s, 1m:"
+MSPT_PATTERN = r"([\d.]+)/([\d.]+)/([\d.]+), ([\d.]+)/([\d.]+)/([\d.]+), ([\d.]+)/([\d.]+)/([\d.]+)\s*$"
+MSPT_WINDOWS = ("5s", "10s", "1m")
+MSPT_STATS = ("avg", "min", "max")
+
+HELP = {
+    "minecraft_up": ("gauge", "Whether the server process is running"),
+    "minecraft_process_cpu_seconds_total": ("counter", "CPU time (user + system) used by the server process"),
+    "minecraft_process_resident_memory_bytes": ("gauge", "Resident memory of the server process"),
+    "minecraft_process_threads": ("gauge", "Threads of the server process"),
+    "minecraft_process_read_bytes_total": ("counter", "Bytes the server process read from storage"),
+    "minecraft_process_write_bytes_total": ("counter", "Bytes the server process wrote to storage"),
+    "minecraft_tps": ("gauge", "Ticks per second reported by the server"),
+    "minecraft_mspt": ("gauge", "Milliseconds per tick reported by the server"),
+    "minecraft_startup_seconds": ("gauge", "Seconds from launching the server to its Done message"),
+    "minecraft_metrics_sample_seconds": ("gauge", "Time the last /proc sample of every server took"),
+}
+
+
+def read_proc(pid: int) -> dict:
+    """Reads CPU time, RSS and thread count from /proc/<pid>/stat and I/O from /proc/<pid>/io."""
+    with open(f"/proc/{pid}/stat", "rb") as file:
+        stat = file.read()
+    # the command name may hold spaces, the fields start after its closing parenthesis
+    fields = stat[stat.rindex(b")") + 2:].split()
+    sample = {
+        "minecraft_process_cpu_seconds_total": (int(fields[11]) + int(fields[12])) / CLOCK_TICKS,
+        "minecraft_process_threads": int(fields[17]),
+        "minecraft_process_resident_memory_bytes": int(fields[21]) * PAGE_SIZE,
+    }
+    try:
+        with open(f"/proc/{pid}/io", "rb") as file:
+            io = dict(line.split(b": ") for line in file.read().splitlines())
+        sample["minecraft_process_read_bytes_total"] = int(io[b"read_bytes"])
+        sample["minecraft_process_write_bytes_total"] = int(io[b"write_bytes"])
+    except (OSError, KeyError, ValueError):
+        # not readable without the right permissions on some kernels
+        pass
+    return sample
+
+
+class MetricsCollector:
+    """Samples the processes of servers from /proc every interval seconds and serves Prometheus text.
+
+    Servers are added with a function returning their current pid (None while
+    they are not running). Values read from the console, like TPS, are recorded
+    with observe. A sample is two small reads per server, and scrapes only
+    render the last sample.
+    """
+
+    def __init__(
+            self, interval: float = DEFAULT_INTERVAL
+    ):
+        self.interval = interval
+
+        self._servers = {}
+        # {(metric, labels): value}
+        self._values = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._http = None
+
+    def add_server(self, name: str, pid):
+        with self._lock:
+            self._servers[name] = pid
+
+    def observe(
+            self, name: str, metric: str, value: float, **labels
+    ):
+        key = (metric, tuple(sorted({"server": name, **labels}.items())))
+        with self._lock:
+            self._values[key] = value
+
+    def sample(self):
+        started = time.perf_counter()
+        with self._lock:
+            servers = dict(self._servers)
+        for name, pid in servers.items():
+            pid = pid()
+            sample = {}
+            if pid:
+                try:
+                    sample = read_proc(pid)
+                except (OSError, ValueError, IndexError):
+                    # exited between getting the pid and reading it
+                    pass
+            self.observe(name, "minecraft_up", 1 if sample else 0)
+            for metric, value in sample.items():
+                self.observe(name, metric, value)
+        with self._lock:
+            self._values[("minecraft_metrics_sample_seconds", ())] = time.perf_counter() - started
+
+    def render(self) -> str:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines, described = [], set()
+        for (metric, labels), value in values:
+            if metric not in described:
+                kind, text = HELP.get(metric, ("gauge", metric))
+                lines.append(f"# HELP {metric} {text}")
+                lines.append(f"# TYPE {metric} {kind}")
+                described.add(metric)
+            label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+            lines.append(f"{metric}{{{label_text}}} {value}" if labels else f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _sample_loop(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+    def serve(
+            self, port: int, host: str = "127.0.0.1"
+    ):
+        """Starts sampling and serves the metrics at http://host:port/metrics."""
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = collector.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # scrapes would flood the server console
+                pass
+
+        self._http = ThreadingHTTPServer((host, port), Handler)
+        self._http.daemon_threads = True
+        threading.Thread(target=self._http.serve_forever, daemon=True).start()
+        threading.Thread(target=self._sample_loop, daemon=True).start()
+
+    def close(self):
+        self._stop.set()
+        if self._http:
+            self._http.shutdown()
+            self._http.server_close()
+            self._http = None
+
+
+def watch_console(
+        collector: MetricsCollector, name: str, console, send, interval: float = DEFAULT_TPS_INTERVAL
+):
+    """Records TPS, MSPT and startup time of a server from its Console.
+
+    After the server is up, `tps` and `mspt` are sent with send(command) every
+    interval seconds (never with interval 0) and their answers are parsed.
+    """
+    started = time.monotonic()
+    stop = threading.Event()
+
+    def record_tps(match, line: str):
+        for window, value in zip(TPS_WINDOWS, match.groups()):
+            collector.observe(name, "minecraft_tps", float(value), window=window)
+
+    def record_mspt(match, line: str):
+        values = iter(match.groups())
+        for window in MSPT_WINDOWS:
+            for stat in MSPT_STATS:
+                collector.observe(name, "minecraft_mspt", float(next(values)), window=window, stat=stat)
+
+    def poll():
+        while not stop.wait(interval):
+            try:
+                send("tps")
+                send("mspt")
+            except OSError:
+                return
+
+    def started_up(match, line: str):
+        collector.observe(name, "minecraft_startup_seconds", time.monotonic() - started)
+        if interval:
+            threading.Thread(target=poll, daemon=True).start()
+
+    console.subscribe(TPS_PATTERN, record_tps)
+    console.subscribe(MSPT_PATTERN, record_mspt)
+    console.subscribe(DONE_PATTERN, started_up, once=True)
+    return stop
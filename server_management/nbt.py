@@ -0,0 +1,136 @@
+import gzip
+import struct
+import zlib
+
+TAG_END = 0
+TAG_BYTE = 1
+TAG_SHORT = 2
+TAG_INT = 3
+TAG_LONG = 4
+TAG_FLOAT = 5
+TAG_DOUBLE = 6
+TAG_BYTE_ARRAY = 7
+TAG_STRING = 8
+TAG_LIST = 9
+TAG_COMPOUND = 10
+TAG_INT_ARRAY = 11
+TAG_LONG_ARRAY = 12
+
+# tag type -> (struct format, size) of the fixed size tags
+_FIXED = {
+    TAG_BYTE: (">b", 1),
+    TAG_SHORT: (">h", 2),
+    TAG_INT: (">i", 4),
+    TAG_LONG: (">q", 8),
+    TAG_FLOAT: (">f", 4),
+    TAG_DOUBLE: (">d", 8),
+}
+# array tag type -> element size
+_ARRAYS = {TAG_BYTE_ARRAY: 1, TAG_INT_ARRAY: 4, TAG_LONG_ARRAY: 8}
+
+
+class _Done(Exception):
+    """Every wanted value was found."""
+
+
+def decompress(data: bytes) -> bytes:
+    """Returns raw NBT from gzip (level.dat), zlib (region chunks) or uncompressed data."""
+    if data[:2] == b"\x1f\x8b":
+        return gzip.decompress(data)
+    if data[:1] == b"\x78":
+        return zlib.decompress(data)
+    return data
+
+
+class _Reader:
+    """Walks NBT without building it: only the values on the wanted paths are decoded."""
+
+    def __init__(
+            self, data: bytes, paths: list
+    ):
+        self.data = memoryview(data)
+        self.wanted = {tuple(path.split(".")) for path in paths}
+        # every compound on the way to a wanted value
+        self.prefixes = {path[:depth] for path in self.wanted for depth in range(1, len(path))}
+        self.found = {}
+
+    def _string(self, offset: int) -> tuple:
+        (length,) = struct.unpack_from(">H", self.data, offset)
+        offset += 2
+        return bytes(self.data[offset:offset + length]).decode("utf-8", "replace"), offset + length
+
+    def _skip(self, tag: int, offset: int) -> int:
+        if tag in _FIXED:
+            return offset + _FIXED[tag][1]
+        if tag in _ARRAYS:
+            (length,) = struct.unpack_from(">i", self.data, offset)
+            return offset + 4 + length * _ARRAYS[tag]
+        if tag == TAG_STRING:
+            (length,) = struct.unpack_from(">H", self.data, offset)
+            return offset + 2 + length
+        if tag == TAG_LIST:
+            item_tag, length = struct.unpack_from(">bi", self.data, offset)
+            offset += 5
+            if item_tag in _FIXED:
+                return offset + max(length, 0) * _FIXED[item_tag][1]
+            for _ in range(length):
+                offset = self._skip(item_tag, offset)
+            return offset
+        if tag == TAG_COMPOUND:
+            while True:
+                item_tag = self.data[offset]
+                offset += 1
+                if item_tag == TAG_END:
+                    return offset
+                (length,) = struct.unpack_from(">H", self.data, offset)
+                offset = self._skip(item_tag, offset + 2 + length)
+        raise ValueError(f"Unknown NBT tag {tag}")
+
+    def _value(self, tag: int, offset: int):
+        if tag in _FIXED:
+            return struct.unpack_from(_FIXED[tag][0], self.data, offset)[0]
+        if tag == TAG_STRING:
+            return self._string(offset)[0]
+        # arrays, lists and compounds are not decoded
+        return None
+
+    def _compound(self, offset: int, path: tuple) -> int:
+        while True:
+            tag = self.data[offset]
+            offset += 1
+            if tag == TAG_END:
+                return offset
+            name, offset = self._string(offset)
+            child = path + (name,)
+            if child in self.wanted:
+                self.found[".".join(child)] = self._value(tag, offset)
+                offset = self._skip(tag, offset)
+            elif tag == TAG_COMPOUND and child in self.prefixes:
+                offset = self._compound(offset, child)
+            else:
+                offset = self._skip(tag, offset)
+            if len(self.found) == len(self.wanted):
+                # everything asked for is known, the rest is never read
+                raise _Done
+
+    def read(self) -> dict:
+        if self.data[0] != TAG_COMPOUND:
+            raise ValueError("NBT data has to start with a compound")
+        _, offset = self._string(1)
+        try:
+            self._compound(offset, ())
+        except _Done:
+            pass
+        return self.found
+
+
+def read_values(
+        data: bytes, paths: list
+) -> dict:
+    """Reads the numbers and strings at dotted paths (e.g. "Data.Version.Name") from NBT data.
+
+    The data is walked lazily: compounds off the wanted paths and every array are
+    skipped without decoding them, and reading stops once all paths are found.
+    Returns {path: value} for the paths that exist.
+    """
+    return _Reader(decompress(data), paths).read()
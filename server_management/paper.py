@@ -0,0 +1,103 @@
+import json
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+from .cache import default_cache_root
+from .downloads import TIMEOUT, make_session
+from .fileutil import write_json
+
+PAPER_API = "https://api.papermc.io/v2/projects/paper"
+DEFAULT_TTL = 3600 # seconds
+
+
+class PaperResolver:
+    """Resolves Paper versions and builds through the Paper v2 API.
+
+    Every API answer is cached on disk for `ttl` seconds and shared by all
+    server directories; a stale answer is still used when the API is unreachable.
+    """
+
+    def __init__(
+            self, cache_dir: Path | None = None, ttl: int = DEFAULT_TTL, session: requests.Session | None = None
+    ):
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_root() / "paper"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self._session = session or make_session()
+        # servers provisioned in parallel wait for one request instead of sending their own
+        self._lock = threading.Lock()
+
+    def _get(
+            self, path: str, refresh: bool = False
+    ) -> dict:
+        cache_file = self.cache_dir / (path.strip("/").replace("/", "_") or "project")
+        cache_file = cache_file.with_name(cache_file.name + ".json")
+
+        with self._lock:
+            return self._get_locked(cache_file, path, refresh)
+
+    def _get_locked(
+            self, cache_file: Path, path: str, refresh: bool
+    ) -> dict:
+        if not refresh and cache_file.exists() and time.time() - cache_file.stat().st_mtime < self.ttl:
+            with open(cache_file, "r") as file:
+                return json.load(file)
+
+        try:
+            response = self._session.get(PAPER_API + path, timeout=TIMEOUT)
+            response.raise_for_status()
+            data = response.json()
+        except requests.RequestException:
+            # offline: a stale answer is better than none
+            if cache_file.exists():
+                with open(cache_file, "r") as file:
+                    return json.load(file)
+            raise
+
+        write_json(cache_file, data)
+        return data
+
+    def versions(self) -> list:
+        return self._get("")["versions"]
+
+    def builds(
+            self, version: str, refresh: bool = False
+    ) -> list:
+        return self._get(f"/versions/{version}/builds", refresh)["builds"]
+
+    def resolve(
+            self, version: str, build: str = "latest-stable"
+    ) -> dict:
+        """Resolves a version ("latest" or e.g. "1.21.4") and a build ("latest",
+        "latest-stable" or a number) to the build's download url, file name and sha256.
+        """
+        if version == "latest":
+            version = self.versions()[-1]
+
+        builds = self.builds(version)
+        if build == "latest":
+            candidates = builds
+        elif build == "latest-stable":
+            candidates = [item for item in builds if item.get("channel") == "default"]
+        else:
+            candidates = [item for item in builds if str(item["build"]) == str(build)]
+            if not candidates:
+                # the build may be newer than the cached answer
+                builds = self.builds(version, refresh=True)
+                candidates = [item for item in builds if str(item["build"]) == str(build)]
+
+        if not candidates:
+            raise ValueError(f"No {build} Paper build found for {version}")
+
+        chosen = candidates[-1]
+        download = chosen["downloads"]["application"]
+        return {
+            "version": version,
+            "build": chosen["build"],
+            "name": download["name"],
+            "sha256": download["sha256"],
+            "url": f"{PAPER_API}/versions/{version}/builds/{chosen['build']}/downloads/{download['name']}",
+        }
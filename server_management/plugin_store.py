@@ -0,0 +1,200 @@
+import fcntl
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+from .cache import default_cache_root, sha256_file
+from .fileutil import locked, write_json
+from .plugins import PLUGIN_SUFFIXES
+
+# FICLONE from linux/fs.h: a copy-on-write clone on btrfs, XFS and other reflink filesystems
+FICLONE = 0x40049409
+
+
+def link_file(
+        source: Path, dest: Path, hardlink: bool = True
+) -> str:
+    """Puts source at dest as a hardlink, a reflink where hardlinks fail (or are not wanted), or a copy.
+
+    dest is replaced in one rename. Returns "hardlink", "reflink" or "copy".
+    """
+    tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        if not hardlink:
+            raise OSError("no hardlink wanted")
+        os.link(source, tmp)
+        how = "hardlink"
+    except OSError:
+        try:
+            with open(source, "rb") as source_file, open(tmp, "wb") as tmp_file:
+                fcntl.ioctl(tmp_file.fileno(), FICLONE, source_file.fileno())
+            how = "reflink"
+        except OSError:
+            shutil.copyfile(source, tmp)
+            how = "copy"
+    os.replace(tmp, dest)
+    return how
+
+
+class PluginStore:
+    """A host-wide, content-addressed store of plugin jars, next to the download cache.
+
+    Every jar is kept once under its SHA-256 and installed into `plugins/` of a
+    server as a hardlink, so 30 servers running the same plugins share one copy
+    on disk and in the page cache. Blobs are read-only: updates replace a jar,
+    they never write into it. A plugin set is a named list of file names and
+    blob references, so packing and restoring one only creates links. Every
+    install is recorded in `installs.json` (path, device and inode), so the
+    store knows which blobs servers still use without counting links.
+    """
+
+    def __init__(
+            self, root: Path | None = None
+    ):
+        self.root = Path(root) if root else default_cache_root() / "plugin-store"
+        self.blobs_dir = self.root / "blobs"
+        self.sets_dir = self.root / "sets"
+        self._installs_file = self.root / "installs.json"
+        self._lock_file = self.root / ".lock"
+
+    def _read_installs(self) -> dict:
+        """Returns {installed path: {"sha256", "device", "inode"}}."""
+        try:
+            with open(self._installs_file, "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_installs(self, installs: dict):
+        write_json(self._installs_file, installs)
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.blobs_dir / sha256[:2] / sha256
+
+    def _set_path(self, name: str) -> Path:
+        path = self.sets_dir / f"{name}.json"
+        if path.parent != self.sets_dir:
+            raise ValueError(f"{name} is not a valid plugin set name")
+        return path
+
+    def add(
+            self, path: Path, sha256: str | None = None, link: bool = False
+    ) -> str:
+        """Adds a jar to the store and returns its sha256.
+
+        The store keeps its own copy (a reflink where the filesystem can), so the
+        jar itself, which becomes read-only in the store, is left as it is. With
+        link the blob is a hardlink of the jar instead, for files that already are
+        read-only copies owned by this tool, like the ones of the download cache.
+        """
+        sha256 = sha256 or sha256_file(path)
+        blob = self.blob_path(sha256)
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            link_file(path, blob, hardlink=link)
+            blob.chmod(0o444)
+        return sha256
+
+    def install(
+            self, sha256: str, dest: Path
+    ) -> str | None:
+        """Links a blob to dest and records it. Returns how (see link_file), or None if dest already is that blob."""
+        blob = self.blob_path(sha256)
+        if not blob.exists():
+            raise FileNotFoundError(f"{sha256} is not in the plugin store {self.root}")
+        how = None if dest.exists() and dest.samefile(blob) else link_file(blob, dest)
+
+        stat = dest.stat()
+        with locked(self._lock_file):
+            installs = self._read_installs()
+            installs[str(dest.resolve())] = {"sha256": sha256, "device": stat.st_dev, "inode": stat.st_ino}
+            self._write_installs(installs)
+        return how
+
+    def create_set(
+            self, name: str, plugins_dir: Path, downloads: dict | None = None
+    ) -> dict:
+        """Adds every jar of plugins_dir to the store and records them as the plugin set name.
+
+        downloads are the download manifest entries of plugins_dir (by file stem),
+        kept with the set so `plugin update` still knows the urls after a restore.
+        """
+        set_path = self._set_path(name)
+        if set_path.exists():
+            raise FileExistsError(f"Plugin set {name} exists")
+
+        plugins = {}
+        for path in sorted(plugins_dir.iterdir()):
+            if path.suffix not in PLUGIN_SUFFIXES or not path.is_file():
+                continue
+            plugins[path.name] = {
+                "sha256": self.add(path),
+                "size": path.stat().st_size,
+                "download": (downloads or {}).get(path.stem),
+            }
+
+        plugin_set = {
+            "name": name,
+            "created": time.time(),
+            "plugins": plugins,
+            "size": sum(entry["size"] for entry in plugins.values()),
+        }
+        self.sets_dir.mkdir(parents=True, exist_ok=True)
+        write_json(set_path, plugin_set, indent=4)
+        return plugin_set
+
+    def read_set(self, name: str) -> dict:
+        path = self._set_path(name)
+        if not path.exists():
+            raise FileNotFoundError(f"Plugin set {name} was not found")
+        with open(path, "r") as file:
+            return json.load(file)
+
+    def list_sets(self) -> list:
+        """Returns every plugin set, oldest first."""
+        if not self.sets_dir.exists():
+            return []
+        plugin_sets = []
+        for path in self.sets_dir.glob("*.json"):
+            with open(path, "r") as file:
+                plugin_sets.append(json.load(file))
+        return sorted(plugin_sets, key=lambda plugin_set: plugin_set["created"])
+
+    def remove_set(
+            self, name: str
+    ) -> int:
+        """Removes a plugin set and the blobs nothing uses anymore. Returns the bytes freed on disk.
+
+        A blob is kept while another set refers to it or a recorded install still
+        is the file it was linked (or copied) to. A removed blob that is also
+        hardlinked elsewhere, e.g. from the download cache, frees nothing.
+        """
+        with locked(self._lock_file):
+            self.read_set(name)
+            self._set_path(name).unlink()
+
+            # installs whose file was removed or replaced since are forgotten
+            installs = {}
+            for path, entry in self._read_installs().items():
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if (stat.st_dev, stat.st_ino) == (entry["device"], entry["inode"]):
+                    installs[path] = entry
+            self._write_installs(installs)
+
+            used = {entry["sha256"] for plugin_set in self.list_sets() for entry in plugin_set["plugins"].values()}
+            used |= {entry["sha256"] for entry in installs.values()}
+            freed = 0
+            for blob in self.blobs_dir.glob("*/*"):
+                if blob.name in used:
+                    continue
+                stat = blob.stat()
+                if stat.st_nlink == 1:
+                    freed += stat.st_size
+                blob.unlink()
+        return freed
@@ -0,0 +1,171 @@
+from pathlib import Path
+
+from .fileutil import atomic_write
+
+_ESCAPES = {"t": "\t", "n": "\n", "r": "\r", "f": "\f"}
+_CONTROL = {value: name for name, value in _ESCAPES.items()}
+# characters Java's Properties.store escapes in values
+_SPECIAL = set("\\=:#!")
+
+
+def _split(line: str) -> tuple:
+    """Splits a property line at the first unescaped =, : or whitespace into (key, value), both still escaped."""
+    index = 0
+    while index < len(line):
+        char = line[index]
+        if char == "\\":
+            index += 2
+            continue
+        if char in "=: \t\f":
+            key = line[:index]
+            rest = line[index:].lstrip(" \t\f")
+            if char in " \t\f" and rest[:1] in ("=", ":"):
+                rest = rest[1:]
+            elif char in "=:":
+                rest = rest[1:]
+            return key, rest.lstrip(" \t\f")
+        index += 1
+    return line, ""
+
+
+def _unescape(text: str) -> str:
+    result, index = [], 0
+    while index < len(text):
+        char = text[index]
+        if char == "\\" and index + 1 < len(text):
+            index += 1
+            char = text[index]
+            if char == "u" and index + 4 < len(text):
+                result.append(chr(int(text[index + 1:index + 5], 16)))
+                index += 4
+            else:
+                result.append(_ESCAPES.get(char, char))
+        else:
+            result.append(char)
+        index += 1
+    return "".join(result)
+
+
+def _escape(text: str, key: bool = False) -> str:
+    result = []
+    for index, char in enumerate(text):
+        if char in _SPECIAL or (char == " " and (key or index == 0)):
+            result.append("\\" + char)
+        elif char in _CONTROL:
+            result.append("\\" + _CONTROL[char])
+        else:
+            result.append(char)
+    return "".join(result)
+
+
+def _format(key: str, value: str) -> str:
+    return f"{_escape(key, key=True)}={_escape(value)}"
+
+
+def _value_text(value) -> str:
+    """JSON values as server.properties writes them: true/false, numbers, and "" for null."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return ""
+    return str(value)
+
+
+class Properties:
+    """An ordered model of a server.properties file that keeps comments, blank lines and order.
+
+    Lines are kept as they were read; only the lines of changed properties are
+    rebuilt, and new properties are appended. save writes the file once, through
+    a temporary file and a rename, and only if something changed.
+    """
+
+    def __init__(
+            self, path: Path
+    ):
+        self.path = path
+        # [line] where a property line is [raw line, key, value], anything else a str
+        self._lines = []
+        self._index = {}
+        self._changed = False
+        self.load()
+
+    def load(self):
+        self._lines, self._index, self._changed = [], {}, False
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as file:
+            for raw in file.read().splitlines():
+                stripped = raw.lstrip()
+                if not stripped or stripped[0] in "#!":
+                    self._lines.append(raw)
+                    continue
+                key, value = _split(stripped)
+                key = _unescape(key)
+                self._index[key] = len(self._lines)
+                self._lines.append([raw, key, _unescape(value)])
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __getitem__(self, key: str) -> str:
+        return self._lines[self._index[key]][2]
+
+    def get(
+            self, key: str, default: str | None = None
+    ) -> str | None:
+        return self[key] if key in self else default
+
+    def items(self) -> list:
+        return [(line[1], line[2]) for line in self._lines if isinstance(line, list)]
+
+    @property
+    def changed(self) -> bool:
+        return self._changed
+
+    def set(self, key: str, value) -> bool:
+        """Sets a property, appending it if it is new. Returns whether the value changed."""
+        value = _value_text(value)
+        if key in self._index:
+            line = self._lines[self._index[key]]
+            if line[2] == value:
+                return False
+            line[0], line[2] = None, value
+        else:
+            self._index[key] = len(self._lines)
+            self._lines.append([None, key, value])
+        self._changed = True
+        return True
+
+    def update(self, params: dict) -> dict:
+        """Sets many properties. Returns {key: (old value or None, new value)} of the ones that changed."""
+        changes = {}
+        for key, value in params.items():
+            old = self.get(key)
+            if self.set(key, value):
+                changes[key] = (old, self[key])
+        return changes
+
+    def dumps(self) -> str:
+        lines = []
+        for line in self._lines:
+            if isinstance(line, str):
+                lines.append(line)
+            elif line[0] is not None:
+                lines.append(line[0])
+            else:
+                lines.append(_format(line[1], line[2]))
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def save(self) -> bool:
+        """Writes the file if anything changed since it was loaded. Returns whether it was written."""
+        if not self._changed:
+            return False
+        with atomic_write(self.path, fsync=True, encoding="utf-8") as file:
+            file.write(self.dumps())
+
+        # the written lines are now what is on disk
+        for line in self._lines:
+            if isinstance(line, list) and line[0] is None:
+                line[0] = _format(line[1], line[2])
+        self._changed = False
+        return True
@@ -0,0 +1,268 @@
+import gzip
+import os
+import re
+import zlib
+from pathlib import Path
+
+from .nbt import read_values
+
+SECTOR_SIZE = 4096
+# 1024 chunk locations followed by 1024 timestamps
+HEADER_SIZE = 2 * SECTOR_SIZE
+CHUNKS_PER_REGION = 1024
+
+COMPRESSION_GZIP = 1
+COMPRESSION_ZLIB = 2
+COMPRESSION_NONE = 3
+# the payload lives in a c.<x>.<z>.mcc file next to the region file
+EXTERNAL_FLAG = 128
+
+# directories holding per-chunk data next to `region`, trimmed along with it
+CHUNK_DATA_DIRS = ("entities", "poi")
+
+_REGION_NAME = re.compile(r"^r\.(-?\d+)\.(-?\d+)\.mca$")
+
+
+def region_coords(path: Path) -> tuple:
+    match = _REGION_NAME.match(path.name)
+    if not match:
+        raise ValueError(f"{path.name} is not a region file")
+    return int(match.group(1)), int(match.group(2))
+
+
+def region_dirs(world_dirs: list, base_dir: Path) -> dict:
+    """Returns {dimension: region dir} for every dimension of the worlds, e.g. "world_nether/DIM-1"."""
+    dirs = {}
+    for world_dir in world_dirs:
+        for region_dir in sorted(world_dir.rglob("region")):
+            if region_dir.is_dir():
+                dirs[str(region_dir.parent.relative_to(base_dir))] = region_dir
+    return dirs
+
+
+class DamagedRegionError(ValueError):
+    """A region file holds chunks that point past its end or have no data."""
+
+    def __init__(self, path: Path, indexes: list):
+        super().__init__(f"{path.name}: truncated chunks {', '.join(map(str, indexes))}")
+        self.path = path
+        self.indexes = indexes
+
+
+def read_chunks(
+        path: Path, drop_damaged: bool = False
+) -> dict:
+    """Reads a region file into {chunk index: (timestamp, compression, compressed data)}.
+
+    The index of the chunk at region-local x, z is x + z * 32. Truncated chunks
+    raise DamagedRegionError, unless drop_damaged is set and they are left out.
+    """
+    data = path.read_bytes()
+    if len(data) < HEADER_SIZE:
+        # the server writes empty region files now and then
+        return {}
+
+    chunks, damaged = {}, []
+    for index in range(CHUNKS_PER_REGION):
+        location = int.from_bytes(data[index * 4:index * 4 + 3], "big")
+        if not location:
+            continue
+        timestamp = int.from_bytes(data[SECTOR_SIZE + index * 4:SECTOR_SIZE + index * 4 + 4], "big")
+        start = location * SECTOR_SIZE
+        length = int.from_bytes(data[start:start + 4], "big")
+        if length < 1 or start + 4 + length > len(data):
+            damaged.append(index)
+            continue
+        chunks[index] = (timestamp, data[start + 4], data[start + 5:start + 4 + length])
+    if damaged:
+        if not drop_damaged:
+            raise DamagedRegionError(path, damaged)
+        print(f"{path.name}: dropping the truncated chunks {', '.join(map(str, damaged))}")
+    return chunks
+
+
+def _sectors(data: bytes) -> int:
+    return -(-(len(data) + 5) // SECTOR_SIZE)
+
+
+def packed_size(chunks: dict) -> int:
+    """The size of a region file holding chunks packed back to back."""
+    if not chunks:
+        return 0
+    return HEADER_SIZE + sum(_sectors(data) for _, _, data in chunks.values()) * SECTOR_SIZE
+
+
+def write_region(
+        path: Path, chunks: dict, verify: bool = False
+) -> int:
+    """Atomically replaces path with a region file holding chunks packed back to back.
+
+    With verify the new file is read back and compared to chunks before it
+    replaces the old one. Without chunks the region file is removed. Returns the new size.
+    """
+    if not chunks:
+        path.unlink(missing_ok=True)
+        return 0
+
+    locations = bytearray(SECTOR_SIZE)
+    timestamps = bytearray(SECTOR_SIZE)
+    body = bytearray()
+    sector = HEADER_SIZE // SECTOR_SIZE
+    for index in sorted(chunks):
+        timestamp, compression, data = chunks[index]
+        sectors = _sectors(data)
+        if sectors > 255:
+            raise ValueError(f"{path.name}: chunk {index} does not fit into 255 sectors")
+        locations[index * 4:index * 4 + 4] = (sector << 8 | sectors).to_bytes(4, "big")
+        timestamps[index * 4:index * 4 + 4] = timestamp.to_bytes(4, "big")
+        body += (len(data) + 1).to_bytes(4, "big") + bytes([compression]) + data
+        body += bytes(sectors * SECTOR_SIZE - len(data) - 5)
+        sector += sectors
+
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp, "wb") as file:
+            file.write(locations)
+            file.write(timestamps)
+            file.write(body)
+            file.flush()
+            os.fsync(file.fileno())
+        if verify and read_chunks(tmp) != chunks:
+            raise ValueError(f"{path.name}: the rewritten region file does not match, it was left as it is")
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return HEADER_SIZE + len(body)
+
+
+def chunk_nbt(compression: int, data: bytes) -> bytes:
+    """Decompresses a chunk payload into raw NBT."""
+    if compression == COMPRESSION_GZIP:
+        return gzip.decompress(data)
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(data)
+    if compression == COMPRESSION_NONE:
+        return data
+    raise ValueError(f"Unsupported chunk compression {compression}")
+
+
+def compact_region(
+        path: Path, level: int | None = None, dry_run: bool = False, drop_damaged: bool = False
+) -> dict:
+    """Rewrites a region file with its chunks packed back to back, dropping free sectors.
+
+    With level every chunk is recompressed with zlib at that level, and kept as it
+    was if that does not make it smaller. Recompressed chunks are checked to
+    decompress to the same NBT, and the new file is read back before it atomically
+    replaces the old one. A file with truncated chunks is left as it is and listed
+    in "damaged", unless drop_damaged is set. Returns the sizes before and after.
+    """
+    size = path.stat().st_size
+    try:
+        chunks = read_chunks(path, drop_damaged)
+    except DamagedRegionError:
+        return {"files": 1, "chunks": 0, "size": size, "new_size": size, "rewritten": 0, "damaged": [str(path)]}
+    report = {"files": 1, "chunks": len(chunks), "size": size, "rewritten": 0, "damaged": []}
+
+    if level is not None:
+        for index, (timestamp, compression, data) in chunks.items():
+            if compression & EXTERNAL_FLAG:
+                continue
+            try:
+                nbt = chunk_nbt(compression, data)
+            except (ValueError, zlib.error, EOFError, OSError):
+                continue
+            recompressed = zlib.compress(nbt, level)
+            if len(recompressed) < len(data) and zlib.decompress(recompressed) == nbt:
+                chunks[index] = (timestamp, COMPRESSION_ZLIB, recompressed)
+
+    report["new_size"] = packed_size(chunks)
+    if report["new_size"] >= report["size"]:
+        # already packed, nothing to win
+        report["new_size"] = report["size"]
+    else:
+        if not dry_run:
+            write_region(path, chunks, verify=True)
+        report["rewritten"] = 1
+    return report
+
+
+def parse_area(text: str) -> tuple:
+    """Parses "[dimension:]x1,z1,x2,z2" (block coordinates) into (dimension or None, x1, z1, x2, z2)."""
+    dimension, _, coords = text.rpartition(":")
+    try:
+        x1, z1, x2, z2 = (int(value) for value in coords.split(","))
+    except ValueError:
+        raise ValueError(f"{text} is not an area, use [dimension:]x1,z1,x2,z2")
+    return dimension or None, min(x1, x2), min(z1, z2), max(x1, x2), max(z1, z2)
+
+
+def areas_for(dimension: str, areas: list) -> list:
+    """The (x1, z1, x2, z2) areas that apply to a dimension; areas without one apply to all."""
+    return [
+        area[1:] for area in areas
+        if area[0] is None or dimension == area[0] or dimension.startswith(area[0].rstrip("/") + "/")
+    ]
+
+
+def _protected(region_x: int, region_z: int, index: int, areas: list) -> bool:
+    x = (region_x * 32 + index % 32) * 16
+    z = (region_z * 32 + index // 32) * 16
+    return any(x <= x2 and x + 15 >= x1 and z <= z2 and z + 15 >= z1 for x1, z1, x2, z2 in areas)
+
+
+def _inhabited_time(compression: int, data: bytes) -> int | None:
+    values = read_values(chunk_nbt(compression, data), ["InhabitedTime", "Level.InhabitedTime"])
+    # 1.18+ keeps it at the top, older chunks inside Level
+    return values.get("InhabitedTime", values.get("Level.InhabitedTime"))
+
+
+def trim_region(
+        path: Path, max_ticks: int, areas: list, dry_run: bool = False, drop_damaged: bool = False
+) -> dict:
+    """Drops the chunks of a region file whose InhabitedTime is at most max_ticks.
+
+    Chunks touching one of areas, stored outside the region file or that can not
+    be read are kept. The same chunks are dropped from the entities and poi files
+    of the region. If the region file or one of those has truncated chunks, none
+    of them is touched and they are listed in "damaged", unless drop_damaged is set.
+    Returns the chunk counts and the sizes before and after.
+    """
+    region_x, region_z = region_coords(path)
+    paths = [path, *(path.parent.parent / name / path.name for name in CHUNK_DATA_DIRS)]
+    paths = [file_path for file_path in paths if file_path.exists()]
+    size = sum(file_path.stat().st_size for file_path in paths)
+
+    # every file is read before anything is written, so a damaged one stops them all
+    files, damaged = [], []
+    for file_path in paths:
+        try:
+            files.append((file_path, read_chunks(file_path, drop_damaged)))
+        except DamagedRegionError:
+            damaged.append(str(file_path))
+    if damaged:
+        return {"chunks": 0, "dropped": 0, "size": size, "new_size": size, "damaged": damaged}
+    chunks = files[0][1]
+
+    dropped = set()
+    for index, (_, compression, data) in chunks.items():
+        if compression & EXTERNAL_FLAG or _protected(region_x, region_z, index, areas):
+            continue
+        try:
+            inhabited = _inhabited_time(compression, data)
+        except (ValueError, zlib.error, EOFError, OSError, IndexError):
+            continue
+        if inhabited is not None and inhabited <= max_ticks:
+            dropped.add(index)
+
+    report = {"chunks": len(chunks), "dropped": len(dropped), "size": size, "new_size": 0, "damaged": []}
+    for file_path, file_chunks in files:
+        kept = {index: chunk for index, chunk in file_chunks.items() if index not in dropped}
+        if not dropped:
+            report["new_size"] += file_path.stat().st_size
+        elif dry_run:
+            report["new_size"] += packed_size(kept)
+        else:
+            report["new_size"] += write_region(file_path, kept)
+    return report
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .fileutil import write_json
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class SnapshotStore:
+    """Incremental, deduplicated world snapshots kept in `<server_dir>/.snapshots`.
+
+    Every world file (region files included) is stored once as a blob named by its
+    SHA-256, a snapshot is a manifest of paths pointing at blobs. Files whose size
+    and mtime did not change since the previous snapshot are not even read again.
+    """
+
+    def __init__(
+            self, server_dir: Path, workers: int = 8
+    ):
+        self.root = server_dir / ".snapshots"
+        self.blobs_dir = self.root / "blobs"
+        self.manifests_dir = self.root / "manifests"
+        self.workers = workers
+
+    def _blob_path(self, sha256: str) -> Path:
+        return self.blobs_dir / sha256[:2] / sha256
+
+    def _manifest_path(self, name: str) -> Path:
+        path = self.manifests_dir / f"{name}.json"
+        if path.parent != self.manifests_dir:
+            raise ValueError(f"{name} is not a valid snapshot name")
+        return path
+
+    def _read_manifest(self, name: str) -> dict:
+        path = self._manifest_path(name)
+        if not path.exists():
+            raise FileNotFoundError(f"Snapshot {name} was not found")
+        with open(path, "r") as file:
+            return json.load(file)
+
+    def _latest_manifest(self) -> dict | None:
+        manifests = sorted(self.manifests_dir.glob("*.json"), key=lambda path: path.stat().st_mtime)
+        if not manifests:
+            return None
+        with open(manifests[-1], "r") as file:
+            return json.load(file)
+
+    def _store_file(self, path: Path) -> tuple:
+        """Hashes a file and copies it into a blob in the same pass.
+
+        Returns the sha256 and the number of bytes written to the store (0 for a known blob).
+        """
+        digest = hashlib.sha256()
+        tmp = self.blobs_dir / f".{uuid.uuid4().hex}.tmp"
+        with open(path, "rb") as source, open(tmp, "wb") as target:
+            for chunk in iter(lambda: source.read(COPY_BUFFER_SIZE), b""):
+                digest.update(chunk)
+                target.write(chunk)
+
+        sha256 = digest.hexdigest()
+        blob = self._blob_path(sha256)
+        if blob.exists():
+            tmp.unlink()
+            return sha256, 0
+        blob.parent.mkdir(exist_ok=True)
+        os.replace(tmp, blob)
+        return sha256, blob.stat().st_size
+
+    def create(
+            self, name: str, world_dirs: list, base_dir: Path
+    ) -> dict:
+        """Snapshots world_dirs (paths inside base_dir) under name and returns its manifest."""
+        manifest_path = self._manifest_path(name)
+        if manifest_path.exists():
+            raise FileExistsError(f"Snapshot {name} exists")
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.manifests_dir.mkdir(parents=True, exist_ok=True)
+
+        previous = self._latest_manifest()
+        previous_files = previous["files"] if previous else {}
+
+        dirs, files = [], {}
+        for world_dir in world_dirs:
+            dirs.append(str(world_dir.relative_to(base_dir)))
+            for root, sub_dirs, file_names in os.walk(world_dir):
+                root = Path(root)
+                dirs.extend(str((root / sub_dir).relative_to(base_dir)) for sub_dir in sub_dirs)
+                for file_name in file_names:
+                    path = root / file_name
+                    stat = path.stat()
+                    files[str(path.relative_to(base_dir))] = {
+                        "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "mode": stat.st_mode & 0o777
+                    }
+
+        def snapshot_file(item: tuple) -> int:
+            relative, entry = item
+            old = previous_files.get(relative)
+            if old and (old["size"], old["mtime_ns"]) == (entry["size"], entry["mtime_ns"]) \
+                    and self._blob_path(old["sha256"]).exists():
+                entry["sha256"] = old["sha256"]
+                return 0
+            entry["sha256"], written = self._store_file(base_dir / relative)
+            return written
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            written = sum(executor.map(snapshot_file, files.items()))
+
+        manifest = {
+            "name": name,
+            "created": time.time(),
+            "dirs": dirs,
+            "files": files,
+            "size": sum(entry["size"] for entry in files.values()),
+            "written": written,
+        }
+        write_json(manifest_path, manifest)
+        return manifest
+
+    def restore(
+            self, name: str, base_dir: Path
+    ):
+        """Rebuilds the worlds of a snapshot inside base_dir."""
+        manifest = self._read_manifest(name)
+
+        for directory in manifest["dirs"]:
+            (base_dir / directory).mkdir(parents=True, exist_ok=True)
+
+        def restore_file(item: tuple):
+            relative, entry = item
+            target = base_dir / relative
+            # a copy, not a link: the server rewrites region files in place
+            shutil.copyfile(self._blob_path(entry["sha256"]), target)
+            os.chmod(target, entry["mode"])
+            os.utime(target, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            list(executor.map(restore_file, manifest["files"].items()))
+
+    def list(self) -> list:
+        """Returns the manifests of all snapshots (without their file lists), oldest first."""
+        snapshots = []
+        if not self.manifests_dir.exists():
+            return snapshots
+        for path in self.manifests_dir.glob("*.json"):
+            with open(path, "r") as file:
+                manifest = json.load(file)
+            manifest["files"] = len(manifest["files"])
+            manifest.pop("dirs")
+            snapshots.append(manifest)
+        return sorted(snapshots, key=lambda manifest: manifest["created"])
+
+    def remove(
+            self, name: str
+    ) -> int:
+        """Removes a snapshot and every blob no other snapshot uses. Returns the freed bytes."""
+        self._read_manifest(name)
+        self._manifest_path(name).unlink()
+
+        used = set()
+        for path in self.manifests_dir.glob("*.json"):
+            with open(path, "r") as file:
+                used.update(entry["sha256"] for entry in json.load(file)["files"].values())
+
+        freed = 0
+        for blob in self.blobs_dir.glob("*/*"):
+            if blob.name not in used:
+                freed += blob.stat().st_size
+                blob.unlink()
+        return freed
@@ -0,0 +1,238 @@
+import asyncio
+import codecs
+import signal
+import subprocess
+import time
+
+from .console import READ_SIZE
+from .control import ControlServer
+from .fileutil import write_json
+
+STATE_NAME = ".supervisor.json"
+RESTART_POLICIES = ("always", "on-failure", "never")
+DEFAULT_RESTART = {
+    "policy": "on-failure",
+    # crashes in a row before giving up, 0 never gives up
+    "max_restarts": 5,
+    # seconds before the first restart, doubled for each crash in a row
+    "backoff": 5,
+    "max_backoff": 300,
+    # a run this long (seconds) resets the crash count
+    "reset_after": 600,
+}
+DEFAULT_STOP_TIMEOUT = 60
+KILL_TIMEOUT = 10
+
+
+class _LoopStdin:
+    """The stdin of an asyncio subprocess as the file a ControlServer writes commands to from its threads."""
+
+    def __init__(
+            self, loop: asyncio.AbstractEventLoop, process: asyncio.subprocess.Process
+    ):
+        self.loop = loop
+        self.process = process
+
+    def write(self, text: str):
+        self.loop.call_soon_threadsafe(self.process.stdin.write, text.encode("utf-8"))
+
+    def flush(self):
+        pass
+
+
+def _append(
+        log, data: bytes
+):
+    log.write(data)
+    log.flush()
+
+
+def restart_options(options: dict | None) -> dict:
+    restart = {**DEFAULT_RESTART, **(options or {})}
+    if restart["policy"] not in RESTART_POLICIES:
+        raise ValueError(f"Unknown restart policy {restart['policy']}, use one of: {', '.join(RESTART_POLICIES)}")
+    return restart
+
+
+class Supervisor:
+    """Runs many servers as asyncio subprocesses of one event loop and restarts them after crashes.
+
+    Each server's console goes to console.log in its directory, and its state
+    (status, pid, restarts, last exit code) is kept in `.supervisor.json` there.
+    A control socket in the directory takes commands and streams the console,
+    like for a server started in the foreground.
+    Stopping sends `stop` to every server, then SIGTERM after stop_timeout
+    seconds and SIGKILL if that is not enough either.
+    """
+
+    def __init__(
+            self, servers: list, stop_timeout: float = DEFAULT_STOP_TIMEOUT
+    ):
+        # [(ServerHandler, restart options)]
+        self.servers = [(server, restart_options(restart)) for server, restart in servers]
+        self.stop_timeout = stop_timeout
+        self.states = {}
+
+        self._handlers = {server.server_dir.name: server for server, _ in self.servers}
+        self._processes = {}
+        self._stop_tasks = []
+        self._stopping = None
+
+    def _set_state(
+            self, server, **changes
+    ):
+        state = self.states.setdefault(
+            server.server_dir.name, {"status": None, "pid": None, "restarts": 0, "last_exit": None}
+        )
+        state.update(changes, since=time.time())
+
+        write_json(server.server_dir / STATE_NAME, state)
+
+    async def _spawn(self, server) -> asyncio.subprocess.Process:
+        server._eula_handling()
+        # its own session keeps CTRL + C away from the server, so stopping follows stop_timeout instead
+        return await asyncio.create_subprocess_exec(
+            *server._command(), stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            stderr=subprocess.STDOUT, cwd=server.server_dir, start_new_session=True
+        )
+
+    @staticmethod
+    async def _relay_console(
+            server, process: asyncio.subprocess.Process
+    ):
+        """Appends the console to console.log and streams it to control socket clients until the server exits.
+
+        The log is written from a worker thread, so a slow disk holds up neither
+        the loop nor the other servers' consoles.
+        """
+        control = ControlServer(server.server_dir, _LoopStdin(asyncio.get_running_loop(), process))
+        control.start()
+        # a read can end inside a multibyte character, the decoder keeps it for the next one
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        log = None
+        try:
+            log = await asyncio.to_thread(open, server.server_dir / "console.log", "ab")
+            while True:
+                data = await process.stdout.read(READ_SIZE)
+                if not data:
+                    break
+                await asyncio.to_thread(_append, log, data)
+                text = decoder.decode(data)
+                if text:
+                    control.broadcast(text)
+            text = decoder.decode(b"", final=True)
+            if text:
+                control.broadcast(text)
+        finally:
+            if log:
+                await asyncio.to_thread(log.close)
+            control.close()
+
+    async def _supervise(
+            self, server, restart: dict
+    ) -> int | Exception:
+        name = server.server_dir.name
+        crashes = 0
+        code = None
+        while True:
+            if self._stopping.is_set():
+                self._set_state(server, status="stopped", pid=None)
+                return code
+            self._set_state(server, status="starting", pid=None)
+            try:
+                process = await self._spawn(server)
+            except OSError as e:
+                self._set_state(server, status="failed")
+                print(f"{name}: FAILED to start: {e}")
+                return e
+            self._processes[name] = process
+            if self._stopping.is_set():
+                # stop() ran while the process was being spawned and could not see it
+                self._set_state(server, status="stopping", pid=process.pid)
+                self._stop_tasks.append(asyncio.ensure_future(self._stop_process(name, process)))
+            else:
+                self._set_state(server, status="running", pid=process.pid)
+            print(f"{name}: started ({server.server_core.name}, {server.ram[0]}-{server.ram[1]} GB, pid {process.pid})")
+
+            started = time.monotonic()
+            relay = asyncio.ensure_future(self._relay_console(server, process))
+            code = await process.wait()
+            await relay
+            self._processes.pop(name, None)
+
+            if self._stopping.is_set():
+                self._set_state(server, status="stopped", pid=None, last_exit=code)
+                return code
+            if restart["policy"] == "never" or (restart["policy"] == "on-failure" and code == 0):
+                self._set_state(server, status="exited", pid=None, last_exit=code)
+                print(f"{name}: exited with {code}")
+                return code
+
+            if time.monotonic() - started >= restart["reset_after"]:
+                crashes = 0
+            crashes += 1
+            if restart["max_restarts"] and crashes > restart["max_restarts"]:
+                self._set_state(server, status="failed", pid=None, last_exit=code)
+                print(f"{name}: exited with {code}, gave up after {crashes - 1} restarts in a row")
+                return code
+
+            delay = min(restart["backoff"] * 2 ** (crashes - 1), restart["max_backoff"])
+            self._set_state(
+                server, status="backoff", pid=None, last_exit=code, restarts=self.states[name]["restarts"] + 1
+            )
+            print(f"{name}: exited with {code}, restarting in {delay:g}s")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), delay)
+                self._set_state(server, status="stopped")
+                return code
+            except asyncio.TimeoutError:
+                pass
+
+    async def _stop_process(
+            self, name: str, process: asyncio.subprocess.Process
+    ):
+        try:
+            process.stdin.write(b"stop\n")
+            await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        try:
+            await asyncio.wait_for(process.wait(), self.stop_timeout)
+            return
+        except asyncio.TimeoutError:
+            print(f"{name}: did not stop in {self.stop_timeout:g}s, sending SIGTERM")
+        if process.returncode is None:
+            process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), KILL_TIMEOUT)
+        except asyncio.TimeoutError:
+            print(f"{name}: did not exit after SIGTERM, sending SIGKILL")
+            process.kill()
+            await process.wait()
+
+    def stop(self):
+        """Stops every server; servers waiting for a restart are not started again."""
+        if self._stopping.is_set():
+            return
+        print("Stopping every server...")
+        self._stopping.set()
+        for name, process in list(self._processes.items()):
+            if process.returncode is None:
+                self._set_state(self._handlers[name], status="stopping")
+                self._stop_tasks.append(asyncio.ensure_future(self._stop_process(name, process)))
+
+    async def run(self) -> dict:
+        """Runs every server until all of them exit for good. Returns {name: exit code or exception}."""
+        self._stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_number, self.stop)
+        try:
+            results = await asyncio.gather(
+                *(self._supervise(server, restart) for server, restart in self.servers)
+            )
+            await asyncio.gather(*self._stop_tasks)
+        finally:
+            for signal_number in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(signal_number)
+        return {server.server_dir.name: result for (server, _), result in zip(self.servers, results)}
@@ -0,0 +1,202 @@
+import copy
+import difflib
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import yaml
+
+from .fileutil import atomic_write
+from .properties import Properties
+
+PROPERTIES_SUFFIX = ".properties"
+YAML_SUFFIXES = (".yml", ".yaml")
+# libyaml when PyYAML was built with it, several times faster on big paper configs
+_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+# a block mapping key line: indent, key (plain or quoted), the colon and the value with its comment
+_YAML_KEY = re.compile(r"""^( *)(?:"([^"]*)"|'([^']*)'|([^\s#'"\-][^:#]*?))[ \t]*:(?=\s|$)(.*)$""")
+_YAML_COMMENT = re.compile(r"\s+#.*$")
+
+
+def merge(base: dict, override: dict) -> dict:
+    """Deep-merges override into a copy of base; lists and values are replaced, dicts are merged."""
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def config_files(server: dict) -> dict:
+    """Returns {path in the server directory: overrides} of a server: its "configs" and "properties"."""
+    files = dict(server.get("configs", {}))
+    if server.get("properties"):
+        files["server.properties"] = {**files.get("server.properties", {}), **server["properties"]}
+    return files
+
+
+def _config_path(
+        server_dir: Path, name: str
+) -> Path:
+    path = Path(name)
+    if path.is_absolute() or ".." in path.parts:
+        raise ValueError(f"{name} has to be a path inside the server directory")
+    return server_dir / path
+
+
+def _changed_values(
+        data: dict, overrides: dict, path: tuple = ()
+) -> list | None:
+    """Returns the (key path, old value, new value) of every scalar overrides changes in data.
+
+    None if overrides add keys or change lists or mappings, which can not be
+    patched into the text of a file.
+    """
+    changes = []
+    for key, value in overrides.items():
+        old = data.get(key)
+        if isinstance(value, dict) and isinstance(old, dict):
+            nested = _changed_values(old, value, (*path, key))
+            if nested is None:
+                return None
+            changes += nested
+        elif value != old:
+            if key not in data or isinstance(old, (dict, list)) or isinstance(value, (dict, list)):
+                return None
+            changes.append(((*path, key), old, value))
+    return changes
+
+
+def _yaml_scalar(value) -> str:
+    text = yaml.dump([value], Dumper=_DUMPER, default_flow_style=True, width=2 ** 30, allow_unicode=True)
+    return text.strip()[1:-1]
+
+
+def _load_value(text: str):
+    try:
+        return yaml.load(f"value:{text}", Loader=_LOADER)["value"]
+    except (yaml.YAMLError, TypeError):
+        return None
+
+
+def _patch_yaml(
+        text: str, changes: list
+) -> str | None:
+    """Replaces the values of existing keys in the text of a block style YAML file.
+
+    Every other line, comment and quoting stays as it is. Returns None if a key
+    is not found on a line of its own.
+    """
+    values = {key_path: (old, new) for key_path, old, new in changes}
+    lines = text.splitlines(keepends=True)
+    # [(indent, key)] of the mappings the current line is in
+    stack = []
+    for number, line in enumerate(lines):
+        match = _YAML_KEY.match(line.rstrip("\r\n"))
+        if not match:
+            continue
+        indent = len(match.group(1))
+        key = next(group for group in match.group(2, 3, 4) if group is not None)
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+        stack.append((indent, key))
+        key_path = tuple(key for _, key in stack)
+        if key_path not in values:
+            continue
+        old, new = values.pop(key_path)
+        rest = match.group(5)
+        comment = _YAML_COMMENT.search(rest)
+        # a " #" inside a quoted value is not a comment: the rest has to hold the old value
+        if comment and _load_value(rest[:comment.start()]) != old:
+            comment = None
+        end = line[len(line.rstrip("\r\n")):]
+        lines[number] = (
+            line[:match.start(5)] + " " + _yaml_scalar(new) + (comment.group(0) if comment else "") + end
+        )
+    return None if values else "".join(lines)
+
+
+def render_file(
+        path: Path, overrides: dict
+) -> tuple | None:
+    """Returns (old text, new text) of a config file with overrides applied, or None if nothing changes.
+
+    .properties files get their keys set (comments and order are kept); YAML and
+    JSON files get overrides deep-merged into their data. Whether something changes
+    is decided on the data, so a file is never rewritten only to be reformatted.
+    YAML files only get the values of existing keys replaced, keeping comments and
+    layout; adding keys or changing lists and mappings rewrites the whole file.
+    """
+    old = path.read_text(encoding="utf-8") if path.exists() else ""
+    if path.suffix == PROPERTIES_SUFFIX:
+        properties = Properties(path)
+        properties.update(overrides)
+        return (old, properties.dumps()) if properties.changed else None
+
+    if path.suffix in YAML_SUFFIXES:
+        data = yaml.load(old, Loader=_LOADER) or {}
+    elif path.suffix == ".json":
+        data = json.loads(old) if old.strip() else {}
+    else:
+        raise ValueError(f"{path.name}: only .properties, .yml, .yaml and .json files can be templated")
+    if not isinstance(data, dict):
+        raise ValueError(f"{path} does not hold a mapping")
+
+    merged = merge(data, overrides)
+    if merged == data:
+        return None
+    if path.suffix == ".json":
+        return old, json.dumps(merged, indent=2) + "\n"
+
+    changes = _changed_values(data, overrides)
+    if changes is not None:
+        patched = _patch_yaml(old, changes)
+        # only kept if it reads back as exactly the merged data
+        if patched is not None and yaml.load(patched, Loader=_LOADER) == merged:
+            return old, patched
+    if old.strip():
+        print(f"{path}: new keys, lists or mappings, the file is rewritten without its comments")
+    return old, yaml.dump(merged, Dumper=_DUMPER, sort_keys=False, default_flow_style=False, allow_unicode=True)
+
+
+def plan(
+        servers: list, workers: int = 8
+) -> list:
+    """Computes the effective config files of every server in parallel.
+
+    servers are full server configs (see fleet.expand_servers). Returns a
+    {"server", "file", "path", "old", "new"} dict per file that would change.
+    """
+    jobs = []
+    for server in servers:
+        server_dir = Path(server["server_dir"]).resolve()
+        for name, overrides in config_files(server).items():
+            jobs.append((server["server_dir"], name, _config_path(server_dir, name), overrides))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        rendered = list(executor.map(lambda job: render_file(job[2], job[3]), jobs))
+    return [
+        {"server": server, "file": name, "path": path, "old": texts[0], "new": texts[1]}
+        for (server, name, path, _), texts in zip(jobs, rendered) if texts
+    ]
+
+
+def diff(change: dict) -> str:
+    name = f"{change['server']}/{change['file']}"
+    return "".join(difflib.unified_diff(
+        change["old"].splitlines(keepends=True), change["new"].splitlines(keepends=True),
+        fromfile=f"a/{name}", tofile=f"b/{name}"
+    ))
+
+
+def write_changes(changes: list):
+    """Writes every changed file through a temporary file and a rename."""
+    for change in changes:
+        path = change["path"]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_write(path, encoding="utf-8") as file:
+            file.write(change["new"])
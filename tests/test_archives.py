@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+from server_management import archives
+from server_management.archives import extract_archive, index_path, write_archive
+
+
+@pytest.fixture
+def world(tmp_path):
+    region = tmp_path / "server" / "world" / "region"
+    region.mkdir(parents=True)
+    (region.parent / "level.dat").write_bytes(b"level")
+    # incompressible, so the archive spans several compressed chunks
+    for number in range(3):
+        (region / f"r.{number}.0.mca").write_bytes(os.urandom(200 * 1024))
+    return region.parent
+
+
+@pytest.mark.parametrize("compression, suffix", [("gz", ".tar.gz"), ("xz", ".tar.xz")])
+def test_extract_multi_chunk_archive_without_index(tmp_path, world, monkeypatch, compression, suffix):
+    monkeypatch.setattr(archives, "CHUNK_SIZE", 64 * 1024)
+    archive_path = tmp_path / f"backup{suffix}"
+    write_archive(archive_path, [world], compression, workers=2)
+    index_path(archive_path).unlink()
+
+    dest = tmp_path / "restored"
+    dest.mkdir()
+    extracted = extract_archive(archive_path, dest)
+
+    assert extracted == 6
+    for path in world.rglob("*"):
+        if path.is_file():
+            assert (dest / "world" / path.relative_to(world)).read_bytes() == path.read_bytes()
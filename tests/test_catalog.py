@@ -0,0 +1,43 @@
+import gzip
+import os
+
+from server_management import archives
+from server_management.archives import index_path, write_archive
+from server_management.catalog import WorldCatalog
+
+
+def _string(text: bytes) -> bytes:
+    return len(text).to_bytes(2, "big") + text
+
+
+def test_list_reads_compressed_archive_without_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(archives, "CHUNK_SIZE", 64 * 1024)
+    world = tmp_path / "build" / "world"
+    (world / "region").mkdir(parents=True)
+    # {"": {"Data": {"LevelName": "survival"}}}
+    level = b"\x0a" + _string(b"") + b"\x0a" + _string(b"Data") + b"\x08" + _string(b"LevelName") \
+        + _string(b"survival") + b"\x00\x00"
+    (world / "level.dat").write_bytes(gzip.compress(level))
+    (world / "region" / "r.0.0.mca").write_bytes(os.urandom(300 * 1024))
+
+    server_dir = tmp_path / "server"
+    server_dir.mkdir()
+    archive_path = server_dir / "survival.tar.gz"
+    write_archive(archive_path, [world], "gz", workers=2)
+    index_path(archive_path).unlink()
+
+    [entry] = WorldCatalog(server_dir).list()
+    assert entry["members"] == 4
+    assert entry["level_name"] == "survival"
+
+
+def test_unreadable_archive_is_not_catalogued(tmp_path):
+    (tmp_path / "broken.tar.gz").write_bytes(b"not an archive")
+    catalog = WorldCatalog(tmp_path)
+    assert catalog.list() == []
+
+    connection = catalog._connect()
+    try:
+        assert connection.execute("SELECT COUNT(*) FROM archives").fetchone()[0] == 0
+    finally:
+        connection.close()
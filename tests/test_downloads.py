@@ -0,0 +1,201 @@
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from urllib3.exceptions import ProtocolError
+
+from server_management import downloads
+from server_management.downloads import download_ranged, is_modified, make_session
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serves server.data at any path, with byte ranges and conditional requests like a static file host."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._respond()
+
+    def do_GET(self):
+        self._respond()
+
+    def _respond(self):
+        site = self.server
+        site.requests.append((self.command, self.headers.get("Range")))
+        if self.command == "HEAD" and not site.head:
+            self.send_response(405)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if site.conditionals and self._not_modified():
+            self.send_response(304)
+            self._validators()
+            self.end_headers()
+            return
+
+        data = site.data
+        start, end = 0, len(data) - 1
+        ranged = site.ranges and self.headers.get("Range") \
+            and self.headers.get("If-Range") in (None, site.etag, site.last_modified)
+        if ranged:
+            first, last = self.headers["Range"].removeprefix("bytes=").split("-")
+            start, end = int(first), min(int(last), end)
+        body = data[start:end + 1]
+
+        self.send_response(206 if ranged else 200)
+        self.send_header("Content-Length", str(len(body)))
+        if ranged:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        if site.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self._validators()
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+
+        if ranged and site.fail_after is not None:
+            # drops the connection midway through the first range
+            body, site.fail_after = body[:site.fail_after], None
+            self.close_connection = True
+        self.wfile.write(body)
+
+    def _not_modified(self) -> bool:
+        site = self.server
+        if self.headers.get("If-None-Match") is not None:
+            return self.headers["If-None-Match"] == site.etag
+        return self.headers.get("If-Modified-Since") is not None \
+            and self.headers["If-Modified-Since"] == site.last_modified
+
+    def _validators(self):
+        if self.server.etag:
+            self.send_header("ETag", self.server.etag)
+        if self.server.last_modified:
+            self.send_header("Last-Modified", self.server.last_modified)
+
+
+@pytest.fixture
+def server():
+    site = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    site.data = os.urandom(256 * 1024)
+    site.etag = '"v1"'
+    site.last_modified = "Sat, 17 Oct 2026 10:00:00 GMT"
+    site.ranges = True
+    site.head = True
+    site.conditionals = True
+    site.fail_after = None
+    site.requests = []
+    site.url = f"http://127.0.0.1:{site.server_address[1]}/plugin.jar"
+    thread = threading.Thread(target=site.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield site
+    site.shutdown()
+    site.server_close()
+
+
+def test_download_ranged_resumes_an_interrupted_download(tmp_path, server, monkeypatch):
+    monkeypatch.setattr(downloads, "MIN_SEGMENT_SIZE", 64 * 1024)
+    monkeypatch.setattr(downloads, "MIN_BUFFER_SIZE", 4096)
+    monkeypatch.setattr(downloads, "MAX_BUFFER_SIZE", 4096)
+    server.fail_after = 50000
+    dest = tmp_path / "plugin.jar"
+
+    with make_session(2) as session:
+        with pytest.raises(ProtocolError):
+            download_ranged(server.url, dest, session, connections=2)
+        assert dest.with_name("plugin.jar.part.json").exists()
+        assert not dest.exists()
+
+        server.requests.clear()
+        meta = download_ranged(server.url, dest, session, connections=2)
+
+    assert dest.read_bytes() == server.data
+    assert meta["sha256"] == hashlib.sha256(server.data).hexdigest()
+    assert not dest.with_name("plugin.jar.part").exists()
+    assert not dest.with_name("plugin.jar.part.json").exists()
+    # only the missing bytes are fetched again, from where the interrupted range stopped
+    assert meta["bytes"] < len(server.data)
+    starts = [int(header.removeprefix("bytes=").split("-")[0]) for method, header in server.requests if header]
+    assert any(start % (128 * 1024) for start in starts)
+
+
+def test_download_ranged_restarts_when_the_file_changed(tmp_path, server, monkeypatch):
+    monkeypatch.setattr(downloads, "MIN_SEGMENT_SIZE", 64 * 1024)
+    monkeypatch.setattr(downloads, "MIN_BUFFER_SIZE", 4096)
+    monkeypatch.setattr(downloads, "MAX_BUFFER_SIZE", 4096)
+    server.fail_after = 50000
+    dest = tmp_path / "plugin.jar"
+
+    with make_session(2) as session:
+        with pytest.raises(ProtocolError):
+            download_ranged(server.url, dest, session, connections=2)
+
+        server.data = os.urandom(256 * 1024)
+        server.etag = '"v2"'
+        meta = download_ranged(server.url, dest, session, connections=2)
+
+    assert dest.read_bytes() == server.data
+    assert meta["bytes"] == len(server.data)
+    assert meta["etag"] == '"v2"'
+
+
+@pytest.mark.parametrize("ranges", [True, False])
+def test_download_ranged_rejects_a_wrong_sha256(tmp_path, server, ranges):
+    server.ranges = ranges
+    dest = tmp_path / "plugin.jar"
+
+    with pytest.raises(ValueError, match="sha256"):
+        download_ranged(server.url, dest, sha256="0" * 64)
+    assert not dest.exists()
+    assert not dest.with_name("plugin.jar.part").exists()
+
+    meta = download_ranged(server.url, dest, sha256=hashlib.sha256(server.data).hexdigest().upper())
+    assert dest.read_bytes() == server.data
+    assert meta["sha256"] == hashlib.sha256(server.data).hexdigest()
+
+
+def test_is_modified_revalidates_with_the_etag(tmp_path, server):
+    with make_session(1) as session:
+        recorded = download_ranged(server.url, tmp_path / "plugin.jar", session)
+        assert recorded["etag"] == '"v1"'
+        assert not is_modified(session, server.url, recorded)
+        assert server.requests[-1][0] == "HEAD"
+
+        server.data = os.urandom(1024)
+        server.etag = '"v2"'
+        assert is_modified(session, server.url, recorded)
+
+
+def test_is_modified_revalidates_with_last_modified(tmp_path, server):
+    server.etag = None
+    with make_session(1) as session:
+        recorded = download_ranged(server.url, tmp_path / "plugin.jar", session)
+        assert recorded["etag"] is None
+        assert not is_modified(session, server.url, recorded)
+
+        server.last_modified = "Sun, 18 Oct 2026 10:00:00 GMT"
+        assert is_modified(session, server.url, recorded)
+
+
+def test_is_modified_compares_validators_when_the_host_ignores_conditions(tmp_path, server):
+    server.conditionals = False
+    with make_session(1) as session:
+        recorded = download_ranged(server.url, tmp_path / "plugin.jar", session)
+        assert not is_modified(session, server.url, recorded)
+
+        server.etag = '"v2"'
+        assert is_modified(session, server.url, recorded)
+
+
+def test_is_modified_falls_back_to_a_conditional_get(tmp_path, server):
+    with make_session(1) as session:
+        recorded = download_ranged(server.url, tmp_path / "plugin.jar", session)
+        server.head = False
+        server.requests.clear()
+        assert not is_modified(session, server.url, recorded)
+        assert [method for method, _ in server.requests] == ["HEAD", "GET"]
@@ -0,0 +1,37 @@
+import os
+import zipfile
+
+from server_management import plugins
+from server_management.plugins import PluginIndex
+
+
+def _jar(path, descriptor: str):
+    with zipfile.ZipFile(path, "w") as jar:
+        jar.writestr("plugin.yml", descriptor)
+
+
+def test_list_rereads_only_changed_jars(tmp_path, monkeypatch):
+    _jar(tmp_path / "a.jar", "name: A\nversion: 1.10\nmain: a.A\ndepend: [B]\n")
+    _jar(tmp_path / "b.jar.disabled", "name: B\nversion: 2\nmain: b.B\n")
+    (tmp_path / "broken.jar").write_bytes(b"not a jar")
+    index = PluginIndex(tmp_path)
+
+    listed = {plugin["file"]: plugin for plugin in index.list()}
+    assert listed["a.jar"]["version"] == "1.10"
+    assert listed["a.jar"]["depend"] == ["B"]
+    assert listed["a.jar"]["enabled"] is True
+    assert listed["b.jar.disabled"]["enabled"] is False
+    assert listed["broken.jar"]["error"]
+
+    read = []
+    read_plugin = plugins.read_plugin
+    monkeypatch.setattr(plugins, "read_plugin", lambda path: read.append(path.name) or read_plugin(path))
+    _jar(tmp_path / "a.jar", "name: A\nversion: 1.11\nmain: a.A\n")
+    os.utime(tmp_path / "a.jar", ns=(1, 1))
+    (tmp_path / "b.jar.disabled").unlink()
+
+    listed = {plugin["file"]: plugin for plugin in index.list()}
+    assert read == ["a.jar"]
+    assert sorted(listed) == ["a.jar", "broken.jar"]
+    assert listed["a.jar"]["version"] == "1.11"
+    assert listed["a.jar"]["depend"] == []